@@ -1,4 +1,4 @@
-import copy
+import json
 import os
 
 # for multi apps, you should specify the app service name, setup_name and database.name
@@ -11,27 +11,34 @@ from bigchaindb.base_config import unichain_config
 # PORT_NUMBER = reduce(lambda x, y: x * y, map(ord, 'BigchainDB')) % 2**16
 # basically, the port number is 9984
 
+_server_config = unichain_config['server_config']
+_default_server_bind = 'localhost:{}'.format(_server_config['server_port'])
+_default_api_endpoint = 'http://localhost:{}/uniledger/v1'.format(_server_config['server_port'])
+_default_restore_server_bind = 'localhost:{}'.format(_server_config['restore_server_port'])
+_default_restore_endpoint = 'http://localhost:{}/uniledger/v1/collect'.format(_server_config['restore_server_port'])
+
 # unichain read `config` from here ,but write-config-file with `base config`
 config = {
     'app': {
-        'setup_name': '{}'.format(unichain_config['server_config']['setup_name']),  # BigchainDB
-        'service_name': '{}'.format(unichain_config['server_config']['service_name']),  # unichain
-        'server_config': '{}'.format(unichain_config['server_config']['server_config']),
-        'key_config': '{}'.format(unichain_config['server_config']['key_config']),
-        'param_config': '{}'.format(unichain_config['server_config']['param_config'])
+        'setup_name': _server_config['setup_name'],  # BigchainDB
+        'service_name': _server_config['service_name'],  # unichain
+        'server_config': _server_config['server_config'],
+        'key_config': _server_config['key_config'],
+        'param_config': _server_config['param_config']
     },
     'server': {
         # Note: this section supports all the Gunicorn settings:
         #       - http://docs.gunicorn.org/en/stable/settings.html
-        'bind': os.environ.get('BIGCHAINDB_SERVER_BIND') or 'localhost:{}'.format(
-            unichain_config['server_config']['server_port']),
+        'bind': os.environ.get('BIGCHAINDB_SERVER_BIND') or _default_server_bind,
         'workers': None,  # if none, the value will be cpu_count * 2 + 1
         'threads': None,  # if none, the value will be cpu_count * 2 + 1
     },
     'database': {
         'host': os.environ.get('BIGCHAINDB_DATABASE_HOST', 'localhost'),
         'port': 28015,
-        'name': '{}'.format(unichain_config['server_config']['db_name']),
+        'name': _server_config['db_name'],
+        'pool_min': 1,  # idle connections kept open by each process
+        'pool_max': 100,  # connections in use at once by each process
     },
     'keypair': {
         'public': None,
@@ -46,8 +53,7 @@ config = {
     'local_keyring': False,
     'need_local': False,
     'api_need_permission': False,
-    'api_endpoint': os.environ.get('BIGCHAINDB_API_ENDPOINT') or 'http://localhost:{}/uniledger/v1'
-        .format(unichain_config['server_config']['server_port']),
+    'api_endpoint': os.environ.get('BIGCHAINDB_API_ENDPOINT') or _default_api_endpoint,
     'backlog_reassign_delay': 120,
     'logger_config': {
         'debug_to_console': False,
@@ -72,41 +78,41 @@ config = {
         'stale_pipeline.heartbeat_timeout': 20,
         'vote_pipeline.fraction_of_cores': 1,
         'vote_pipeline.validate_processes_num': 30,
-        'vote_pipeline.ungroup_processes_num': 20
+        'write_transaction.batch_size': 200,  # max transactions per backlog insert
+        'write_transaction.flush_interval': 0.005,  # seconds to wait for more transactions
+        'count_cache_ttl': 1,  # seconds to reuse the block and backlog counts
     },
     'order_api': 'http://36.110.71.170:41',
     'restore_server': {
-        'bind': os.environ.get('BIGCHAINDB_RESTORE_SERVER_BIND') or 'localhost:{}'
-            .format(unichain_config['server_config']['restore_server_port']),
+        'bind': os.environ.get('BIGCHAINDB_RESTORE_SERVER_BIND') or _default_restore_server_bind,
         'compress': True,  # if compress, compress the response data
         'workers': None,  # if none, the value will be int(cpu_count/2) + 2
         'threads': None,  # if none, the value will be int(cpu_count/2) + 2
     },
-    'restore_endpoint': os.environ.get('BIGCHAINDB_RESTORE_ENDPOINT') or
-                        'http://localhost:{}/uniledger/v1/collect'.format(
-                            unichain_config['server_config']['restore_server_port']),
+    'restore_endpoint': os.environ.get('BIGCHAINDB_RESTORE_ENDPOINT') or _default_restore_endpoint,
 }
 
 unichain_server_config = {
     'app': {
-        'setup_name': '{}'.format(unichain_config['server_config']['setup_name']),  # BigchainDB
-        'service_name': '{}'.format(unichain_config['server_config']['service_name']),  # unichain
-        'server_config': '{}'.format(unichain_config['server_config']['server_config']),
-        'key_config': '{}'.format(unichain_config['server_config']['key_config']),
-        'param_config': '{}'.format(unichain_config['server_config']['param_config'])
+        'setup_name': _server_config['setup_name'],  # BigchainDB
+        'service_name': _server_config['service_name'],  # unichain
+        'server_config': _server_config['server_config'],
+        'key_config': _server_config['key_config'],
+        'param_config': _server_config['param_config']
     },
     'server': {
         # Note: this section supports all the Gunicorn settings:
         #       - http://docs.gunicorn.org/en/stable/settings.html
-        'bind': os.environ.get('BIGCHAINDB_SERVER_BIND') or 'localhost:{}'.format(
-            unichain_config['server_config']['server_port']),
+        'bind': os.environ.get('BIGCHAINDB_SERVER_BIND') or _default_server_bind,
         'workers': None,  # if none, the value will be cpu_count * 2 + 1
         'threads': None,  # if none, the value will be cpu_count * 2 + 1
     },
     'database': {
         'host': os.environ.get('BIGCHAINDB_DATABASE_HOST', 'localhost'),
         'port': 28015,
-        'name': '{}'.format(unichain_config['server_config']['db_name']),
+        'name': _server_config['db_name'],
+        'pool_min': 1,  # idle connections kept open by each process
+        'pool_max': 100,  # connections in use at once by each process
     },
     'statsd': {
         'host': 'localhost',
@@ -114,17 +120,13 @@ unichain_server_config = {
         'rate': 0.01,
     },
     'restore_server': {
-        'bind': os.environ.get('BIGCHAINDB_RESTORE_SERVER_BIND') or 'localhost:{}'
-            .format(unichain_config['server_config']['restore_server_port']),
+        'bind': os.environ.get('BIGCHAINDB_RESTORE_SERVER_BIND') or _default_restore_server_bind,
         'compress': True,  # if compress, compress the response data
         'workers': None,  # if none, the value will be int(cpu_count/2) + 2
         'threads': None,  # if none, the value will be int(cpu_count/2) + 2
     },
-    'api_endpoint': os.environ.get('BIGCHAINDB_API_ENDPOINT') or 'http://localhost:{}/uniledger/v1'
-        .format(unichain_config['server_config']['server_port']),
-    'restore_endpoint': os.environ.get('BIGCHAINDB_RESTORE_ENDPOINT') or
-                        'http://localhost:{}/uniledger/v1/collect'.format(
-                            unichain_config['server_config']['restore_server_port']),
+    'api_endpoint': os.environ.get('BIGCHAINDB_API_ENDPOINT') or _default_api_endpoint,
+    'restore_endpoint': os.environ.get('BIGCHAINDB_RESTORE_ENDPOINT') or _default_restore_endpoint,
 }
 
 unichain_key_config = {
@@ -163,7 +165,9 @@ unichain_param_config = {
         'stale_pipeline.heartbeat_timeout': 20,
         'vote_pipeline.fraction_of_cores': 1,
         'vote_pipeline.validate_processes_num': 30,
-        'vote_pipeline.ungroup_processes_num': 20
+        'write_transaction.batch_size': 200,  # max transactions per backlog insert
+        'write_transaction.flush_interval': 0.005,  # seconds to wait for more transactions
+        'count_cache_ttl': 1,  # seconds to reuse the block and backlog counts
     },
     'order_api': 'http://36.110.71.170:41',
 }
@@ -171,6 +175,8 @@ unichain_param_config = {
 # We need to maintain a backup copy of the original config dict in case
 # the user wants to reconfigure the node. Check ``bigchaindb.config_utils``
 # for more info.
-_config = copy.deepcopy(config)
+# The config only holds JSON values, a JSON round trip copies it much faster
+# than ``copy.deepcopy``.
+_config = json.loads(json.dumps(config))
 from bigchaindb.core import Bigchain  # noqa
 from bigchaindb.version import __version__  # noqa
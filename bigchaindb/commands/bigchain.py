@@ -322,7 +322,7 @@ def run_start(args):
     try:
         db.init()
     except DatabaseAlreadyExists:
-        pass
+        db.migrate()
     except KeypairNotFoundException:
         sys.exit("Can't start {}, no keypair found. "
                  'Did you run `{} configure`?'.format(app_setup_name, app_service_name))
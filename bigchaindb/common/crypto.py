@@ -1,12 +1,17 @@
 # Separate all crypto code so that we can easily test several implementations
 
-import sha3
+try:
+    # OpenSSL backed since Python 3.6
+    from hashlib import sha3_256
+except ImportError:
+    # pysha3 >= 1.0 implements the same (FIPS 202) SHA3-256
+    from sha3 import sha3_256
 from cryptoconditions import crypto
 
 
 def hash_data(data):
     """Hash the provided data using SHA3-256"""
-    return sha3.sha3_256(data.encode()).hexdigest()
+    return sha3_256(data.encode()).hexdigest()
 
 
 def generate_key_pair():
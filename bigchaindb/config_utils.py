@@ -225,7 +225,7 @@ def set_config(config):
         Any previous changes made to ``bigchaindb.config`` will be lost.
     """
     # Deep copy the default config into bigchaindb.config
-    bigchaindb.config = copy.deepcopy(bigchaindb._config)
+    bigchaindb.config = json.loads(json.dumps(bigchaindb._config))
     # Update the default config with whatever is in the passed config
     update(bigchaindb.config, update_types(config, bigchaindb.config))
     bigchaindb.config['CONFIGURED'] = True
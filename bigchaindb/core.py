@@ -2,6 +2,7 @@ import collections
 import json
 import math
 import random
+from concurrent.futures import Future
 from itertools import compress
 from time import time, mktime, strptime
 
@@ -79,7 +80,7 @@ class Bigchain(object):
         self.nodelist.append(self.me)
         self.nodelist.sort()
 
-    def write_transaction(self, signed_transaction, durability='soft'):
+    def write_transaction(self, signed_transaction, durability='soft', wait=True):
         """Write the transaction to bigchain.
 
         When first writing a transaction to the bigchain the transaction will be kept in a backlog until
@@ -87,6 +88,8 @@ class Bigchain(object):
 
         Args:
             signed_transaction (Transaction): transaction with the `signature` included.
+            wait (bool): whether to wait for the transaction to be written to the backlog, when
+                `False` a :class:`~concurrent.futures.Future` of the database response is returned.
 
         Returns:
             dict: database response
@@ -107,8 +110,13 @@ class Bigchain(object):
         if self.split_backlog:
             # write to the backlog
             node_name = assignee[0:5]
-            return self.backend.write_transaction_to_all(signed_transaction, node_name=node_name)
-        return self.backend.write_transaction(signed_transaction)
+            response = self.backend.write_transaction_to_all(signed_transaction, node_name=node_name)
+            if wait:
+                return response
+            future = Future()
+            future.set_result(response)
+            return future
+        return self.backend.write_transaction(signed_transaction, wait=wait)
 
     def reassign_transaction(self, transaction):
         """Assign a transaction to a new node
@@ -228,34 +236,15 @@ class Bigchain(object):
             transaction's status if the transaction was found.
         """
 
-        response, tx_status = None, None
+        response = None
 
         validity = self.get_blocks_status_containing_tx(txid)
-        check_backlog = True
-
-        if validity:
-            # Disregard invalid blocks, and return if there are no valid or undecided blocks
-            validity = {_id: status for _id, status in validity.items()
-                        if status != Bigchain.BLOCK_INVALID}
-            if validity:
-
-                # The transaction _was_ found in an undecided or valid block,
-                # so there's no need to look in the backlog table
-                check_backlog = False
-
-                tx_status = self.TX_UNDECIDED
-                # If the transaction is in a valid or any undecided block, return it. Does not check
-                # if transactions in undecided blocks are consistent, but selects the valid block
-                # before undecided ones
-                for target_block_id in validity:
-                    if validity[target_block_id] == Bigchain.BLOCK_VALID:
-                        tx_status = self.TX_VALID
-                        break
-
-                # Query the transaction in the target block and return
-                response = self.backend.get_transaction_from_block(txid, target_block_id)
-
-        if check_backlog:
+        target_block_id, tx_status = self._select_block(validity)
+
+        if target_block_id:
+            # Query the transaction in the target block and return
+            response = self.backend.get_transaction_from_block(txid, target_block_id)
+        else:
             response = self.backend.get_transaction_from_backlog(txid)
 
             if response:
@@ -269,6 +258,83 @@ class Bigchain(object):
         else:
             return response
 
+    def get_transactions_bulk(self, txids):
+        """Get several transactions with their status.
+
+        Same as :meth:`get_transaction` with ``include_status=True`` for
+        each transaction, but the blocks holding the transactions are read
+        in a single query.
+
+        Args:
+            txids (list): ids of the transactions to get.
+
+        Returns:
+            dict: the ``(transaction, status)`` tuple of each transaction id,
+            ``(None, None)`` for the transactions that were not found.
+        """
+        txids = set(txids)
+        if not txids:
+            return {}
+
+        validity = {}
+        found = collections.defaultdict(dict)
+        for block in self.backend.get_blocks_status_from_transactions(txids):
+            validity[block['id']] = self.block_election_status(block['id'],
+                                                               block['block']['voters'])
+            for tx in block['transactions']:
+                found[tx['id']][block['id']] = tx
+
+        result = {}
+        for txid in txids:
+            tx_validity = {block_id: validity[block_id] for block_id in found[txid]}
+            self._check_valid_blocks(txid, tx_validity)
+            target_block_id, tx_status = self._select_block(tx_validity)
+
+            if target_block_id:
+                response = found[txid][target_block_id]
+            else:
+                response = self.backend.get_transaction_from_backlog(txid)
+
+                if response:
+                    tx_status = self.TX_IN_BACKLOG
+
+            if response:
+                response = Transaction.from_dict(response)
+
+            result[txid] = (response, tx_status)
+
+        return result
+
+    @classmethod
+    def _select_block(cls, validity):
+        """Select the block to read a transaction from.
+
+        Args:
+            validity (dict): the status of the blocks holding the
+                transaction, or ``None``.
+
+        Returns:
+            The id of the block and the status of the transaction, or
+            ``(None, None)`` if the transaction is not in a valid or
+            undecided block.
+        """
+        # Disregard invalid blocks, and return if there are no valid or undecided blocks
+        validity = {_id: status for _id, status in (validity or {}).items()
+                    if status != cls.BLOCK_INVALID}
+        if not validity:
+            return None, None
+
+        # If the transaction is in a valid or any undecided block, return it. Does not check
+        # if transactions in undecided blocks are consistent, but selects the valid block
+        # before undecided ones
+        tx_status = cls.TX_UNDECIDED
+        for target_block_id in validity:
+            if validity[target_block_id] == cls.BLOCK_VALID:
+                tx_status = cls.TX_VALID
+                break
+
+        return target_block_id, tx_status
+
     def get_status(self, txid):
         """Retrieve the status of a transaction with `txid` from bigchain.
 
@@ -307,22 +373,26 @@ class Bigchain(object):
                 ) for block in blocks
             }
 
-            # NOTE: If there are multiple valid blocks with this transaction,
-            # something has gone wrong
-            if list(validity.values()).count(Bigchain.BLOCK_VALID) > 1:
-                block_ids = str([block for block in validity
-                                 if validity[block] == Bigchain.BLOCK_VALID])
-                raise exceptions.DoubleSpend('Transaction {tx} is present in '
-                                             'multiple valid blocks: '
-                                             '{block_ids}'
-                                             .format(tx=txid,
-                                                     block_ids=block_ids))
+            self._check_valid_blocks(txid, validity)
 
             return validity
 
         else:
             return None
 
+    @staticmethod
+    def _check_valid_blocks(txid, validity):
+        # NOTE: If there are multiple valid blocks with this transaction,
+        # something has gone wrong
+        if list(validity.values()).count(Bigchain.BLOCK_VALID) > 1:
+            block_ids = str([block for block in validity
+                             if validity[block] == Bigchain.BLOCK_VALID])
+            raise exceptions.DoubleSpend('Transaction {tx} is present in '
+                                         'multiple valid blocks: '
+                                         '{block_ids}'
+                                         .format(tx=txid,
+                                                 block_ids=block_ids))
+
     def get_tx_by_metadata_id(self, metadata_id):
         """Retrieves transactions related to a metadata.
 
@@ -408,6 +478,63 @@ class Bigchain(object):
             # Either no transaction was returned spending the `(txid, output)` as
             # input or the returned transactions are not valid.
 
+    def get_spent_bulk(self, inputs):
+        """Check if several `(txid, cid)` inputs were already used.
+
+        Same as :meth:`get_spent` for each input, but the spending
+        transactions and their status are read in two queries.
+
+        Args:
+            inputs (list): the ``(txid, cid)`` inputs to check.
+
+        Returns:
+            dict: the transaction (Transaction) that used each input, or
+            ``None``.
+
+        Raises:
+            DoubleSpend: If an input was spent in more than one valid
+            transaction.
+        """
+        inputs = set(inputs)
+        if not inputs:
+            return {}
+
+        spenders = collections.defaultdict(list)
+        for transaction in self.backend.get_spent_many(inputs):
+            spent = {(fulfillment['input']['txid'], fulfillment['input']['cid'])
+                     for fulfillment in transaction['transaction']['fulfillments']
+                     if fulfillment['input']}
+            for tx_input in spent & inputs:
+                spenders[tx_input].append(transaction)
+
+        statuses = self.get_transactions_bulk(transaction['id']
+                                              for transactions in spenders.values()
+                                              for transaction in transactions)
+
+        result = {}
+        for txid, cid in inputs:
+            num_valid_transactions = 0
+            non_invalid_transactions = []
+            for transaction in spenders[(txid, cid)]:
+                _, status = statuses[transaction['id']]
+                if status == self.TX_VALID:
+                    num_valid_transactions += 1
+                # `txid` can only have been spent in at most on valid block.
+                if num_valid_transactions > 1:
+                    raise exceptions.DoubleSpend(
+                        '`{}` was spent more than once. There is a problem'
+                        ' with the chain'.format(txid))
+                # if its not and invalid transaction
+                if status is not None:
+                    non_invalid_transactions.append(transaction)
+
+            if non_invalid_transactions:
+                result[(txid, cid)] = Transaction.from_dict(non_invalid_transactions[0])
+            else:
+                result[(txid, cid)] = None
+
+        return result
+
     def get_owned_ids(self, owner):
         """Retrieve a list of `txid`s that can be used as inputs.
 
@@ -529,6 +656,15 @@ class Bigchain(object):
 
         return self.backend.write_block(block.to_str(), durability=durability)
 
+    def write_blocks(self, blocks, durability='soft'):
+        """Write several blocks to bigchain in a single insert.
+
+        Args:
+            blocks (list): the blocks (Block) to write to bigchain.
+        """
+
+        return self.backend.write_blocks([block.to_str() for block in blocks], durability=durability)
+
     def transaction_exists(self, transaction_id):
         return self.backend.has_transaction(transaction_id)
 
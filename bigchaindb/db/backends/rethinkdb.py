@@ -3,17 +3,169 @@
 This module contains all the methods to store and retrieve data from RethinkDB.
 """
 
+import os
 import logging
+import threading
+from collections import defaultdict
+from concurrent.futures import Future
+from multiprocessing import util as mp_util
 from time import time
 
 import rethinkdb as r
 
+import bigchaindb
 from bigchaindb import util
 from bigchaindb.db.utils import Connection
 from bigchaindb.common import exceptions
 
 logger = logging.getLogger(__name__)
 
+# Committed blocks are never modified, so the results of the lookups on them
+# can be kept in memory. The caches are shared by all the backends connected
+# to the same database (e.g. the pooled Bigchain instances of the API).
+CACHE_MAXSIZE = 4096
+
+_MISSING = object()
+_caches = {}
+_caches_lock = threading.Lock()
+
+
+def get_cache(host, port, db):
+    """Return the query cache shared by the backends of a database."""
+
+    key = (host, port, db)
+    with _caches_lock:
+        if key not in _caches:
+            _caches[key] = util.TTLCache(maxsize=CACHE_MAXSIZE)
+        return _caches[key]
+
+
+class InsertBatcher:
+    """Coalesce the documents inserted concurrently into a table.
+
+    Documents are buffered and written with a single array insert when
+    ``batch_size`` documents are waiting or ``flush_interval`` seconds after
+    the first one was buffered, whichever comes first. Each document gets
+    the result of its own insert, in the shape of a single insert response.
+    """
+
+    def __init__(self, connection, table, batch_size, flush_interval, durability='soft'):
+        self.connection = connection
+        self.table = table
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.durability = durability
+        self.buffer = []
+        self.timer = None
+        self.lock = threading.Lock()
+
+    def insert(self, doc):
+        """Buffer a document.
+
+        Returns:
+            :class:`~concurrent.futures.Future`: resolved with the database
+            response for the document once the batch containing it is
+            written.
+        """
+        future = Future()
+        with self.lock:
+            self.buffer.append((doc, future))
+            if len(self.buffer) >= self.batch_size:
+                batch = self._take()
+            else:
+                batch = None
+                if self.timer is None:
+                    self.timer = threading.Timer(self.flush_interval, self.flush)
+                    self.timer.daemon = True
+                    self.timer.start()
+        if batch:
+            self._write(batch)
+        return future
+
+    def flush(self):
+        """Write the buffered documents."""
+
+        with self.lock:
+            batch = self._take()
+        if batch:
+            self._write(batch)
+
+    def _take(self):
+        batch, self.buffer = self.buffer, []
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return batch
+
+    def _write(self, batch):
+        try:
+            # the changes of all the documents, including the failed ones,
+            # are returned, reduced to their id and error on the server
+            response = self.connection.run(
+                r.table(self.table)
+                    .insert([doc for doc, _ in batch], durability=self.durability,
+                            return_changes='always')
+                    .do(lambda res: res.merge({'changes': res['changes'].map(
+                        lambda change: {
+                            'id': r.branch(change['new_val'], change['new_val']['id'],
+                                           change['old_val']['id']),
+                            'error': change['error'].default(None),
+                        })})))
+        except Exception as exc:
+            logger.exception('Failed to insert %s documents into %s', len(batch), self.table)
+            for _, future in batch:
+                future.set_exception(exc)
+            return
+
+        errors = defaultdict(list)
+        for change in response['changes']:
+            errors[change['id']].append(change['error'])
+        for doc, future in batch:
+            try:
+                error = errors[doc['id']].pop(0)
+            except IndexError:
+                error = response.get('first_error', 'Document not inserted')
+            future.set_result(self._document_response(error))
+
+    @staticmethod
+    def _document_response(error):
+        response = {'deleted': 0, 'replaced': 0, 'skipped': 0, 'unchanged': 0}
+        if error is None:
+            response.update(inserted=1, errors=0)
+        else:
+            response.update(inserted=0, errors=1, first_error=error)
+        return response
+
+
+_batchers = {}
+
+
+def get_batcher(connection, table, durability):
+    """Return the insert batcher of this process for a table."""
+
+    key = (os.getpid(), connection.host, connection.port, connection.db, table)
+    with _caches_lock:
+        if key not in _batchers:
+            argument_config = bigchaindb.config['argument_config']
+            batcher = _batchers[key] = InsertBatcher(connection, table,
+                                                     argument_config['write_transaction.batch_size'],
+                                                     argument_config['write_transaction.flush_interval'],
+                                                     durability=durability)
+            # the documents still buffered are written when the process
+            # exits, including the pipeline processes which skip atexit
+            mp_util.Finalize(batcher, batcher.flush, exitpriority=10)
+        return _batchers[key]
+
+
+def _log_failed_write(future):
+    try:
+        response = future.result()
+    except Exception:
+        # already logged with the failed batch
+        return
+    if response['errors']:
+        logger.error('Failed to write a transaction: %s', response['first_error'])
+
 
 class RethinkDBBackend:
     def __init__(self, host=None, port=None, db=None):
@@ -28,21 +180,63 @@ class RethinkDBBackend:
         self.read_mode = 'majority'
         self.durability = 'soft'
         self.connection = Connection(host=host, port=port, db=db)
+        self.cache = get_cache(self.connection.host, self.connection.port,
+                               self.connection.db)
+
+        # the ReQL terms are immutable: the table terms read by most of the
+        # queries are built once and shared by all the calls
+        self._bigchain = r.table('bigchain', read_mode=self.read_mode)
+        self._votes = r.table('votes', read_mode=self.read_mode)
+
+    def _cached(self, key, func, ttl=None, cache_falsy=False):
+        """Return the cached result for ``key``, run ``func`` on a miss.
+
+        Args:
+            key (tuple): the cache key.
+            func: a callable running the query.
+            ttl (Optional[float]): seconds to keep the result, if ``None``
+                the result never expires.
+            cache_falsy (bool): whether to cache falsy results. Lookups of
+                data that does not exist (yet) must not be cached.
 
-    def write_transaction(self, signed_transaction, node_name=''):
+        Returns:
+            The result of the query.
+        """
+        result = self.cache.get(key, _MISSING)
+        if result is _MISSING:
+            result = func()
+            if result or cache_falsy:
+                self.cache.set(key, result, ttl=ttl)
+        return result
+
+    @staticmethod
+    def _count_cache_ttl():
+        # counters change all the time, they are cached just long enough to
+        # absorb the bursts of status requests
+        return bigchaindb.config['argument_config']['count_cache_ttl']
+
+    def write_transaction(self, signed_transaction, node_name='', wait=True):
         """Write a transaction to the backlog table.
 
+        Transactions written concurrently are grouped into a single insert.
+
         Args:
             signed_transaction (dict): a signed transaction.
+            wait (bool): whether to wait for the transaction to be written.
 
         Returns:
-            The result of the operation.
+            The database response for the transaction, or a
+            :class:`~concurrent.futures.Future` of it if ``wait`` is
+            ``False``. The failed writes which are not waited for are
+            logged.
         """
         logger.debug("Writing transaction id = %s", signed_transaction['id'])
 
-        return self.connection.run(
-            r.table('backlog')
-                .insert(signed_transaction, durability=self.durability))
+        future = get_batcher(self.connection, 'backlog', self.durability).insert(signed_transaction)
+        if wait:
+            return future.result()
+        future.add_done_callback(_log_failed_write)
+        return future
 
     def write_transaction_to_all(self, signed_transaction, node_name=''):
         """Write a transaction to the backlog table.
@@ -128,12 +322,14 @@ class RethinkDBBackend:
         Returns:
             The matching transaction.
         """
-        return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
-                .get(block_id)
-                .get_field('block')
-                .get_field('transactions')
-                .filter(lambda tx: tx['id'] == transaction_id))[0]
+        return self._cached(
+            ('transaction_from_block', transaction_id, block_id),
+            lambda: self.connection.run(
+                self._bigchain
+                    .get(block_id)
+                    .get_field('block')
+                    .get_field('transactions')
+                    .filter(lambda tx: tx['id'] == transaction_id))[0])
 
     def get_transaction_from_backlog(self, transaction_id):
         """Get a transaction from backlog.
@@ -170,10 +366,36 @@ class RethinkDBBackend:
         """
 
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
                 .get_all(transaction_id, index='transaction_id')
                 .pluck('votes', 'id', {'block': ['voters']}))
 
+    def get_blocks_status_from_transactions(self, transaction_ids):
+        """Retrieve the election information of the blocks holding any of
+        several transactions, in a single query.
+
+        Args:
+            transaction_ids (list): the ids of the transactions.
+
+        Returns:
+            A list of blocks with only their id, voters and the matching
+            transactions (``transactions``). A block holding several of the
+            transactions is returned once.
+        """
+        transaction_ids = list(transaction_ids)
+        block_ids = self._bigchain \
+            .get_all(r.args(transaction_ids), index='transaction_id') \
+            .get_field('id').distinct().coerce_to('array')
+        return self.connection.run(
+            self._bigchain
+                .get_all(r.args(block_ids))
+                .map(lambda block: {
+                    'id': block['id'],
+                    'block': {'voters': block['block']['voters']},
+                    'transactions': block['block']['transactions'].filter(
+                        lambda tx: r.expr(transaction_ids).contains(tx['id']))
+                }))
+
     def get_transactions_by_metadata_id(self, metadata_id):
         """Retrieves transactions related to a metadata.
 
@@ -191,7 +413,7 @@ class RethinkDBBackend:
             returns an empty list `[]`
         """
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
                 .get_all(metadata_id, index='metadata_id')
                 .concat_map(lambda block: block['block']['transactions'])
                 .filter(lambda transaction: transaction['transaction']['metadata']['id'] == metadata_id))
@@ -211,7 +433,7 @@ class RethinkDBBackend:
         """
 
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
                 .get_all(asset_id, index='asset_id')
                 .concat_map(lambda block: block['block']['transactions'])
                 .filter(lambda transaction: transaction['transaction']['asset']['id'] == asset_id))
@@ -230,13 +452,37 @@ class RethinkDBBackend:
             The transaction that used the `txid` as an input else `None`
         """
 
-        # TODO: use index!
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
+                .get_all([transaction_id, condition_id], index='spent_inputs')
                 .concat_map(lambda doc: doc['block']['transactions'])
                 .filter(lambda transaction: transaction['transaction']['fulfillments'].contains(
                 lambda fulfillment: fulfillment['input'] == {'txid': transaction_id, 'cid': condition_id})))
 
+    def get_spent_many(self, inputs):
+        """Retrieve the transactions spending any of several inputs, in a
+        single query.
+
+        Args:
+            inputs (list): the ``(transaction_id, condition_id)`` inputs.
+
+        Returns:
+            The transactions using any of the inputs, once per block holding
+            them.
+        """
+        keys = [[txid, cid] for txid, cid in inputs]
+        wanted = [{'txid': txid, 'cid': cid} for txid, cid in inputs]
+        # a block spending several of the inputs is matched once per input
+        block_ids = self._bigchain \
+            .get_all(r.args(keys), index='spent_inputs') \
+            .get_field('id').distinct().coerce_to('array')
+        return self.connection.run(
+            self._bigchain
+                .get_all(r.args(block_ids))
+                .concat_map(lambda doc: doc['block']['transactions'])
+                .filter(lambda transaction: transaction['transaction']['fulfillments'].contains(
+                lambda fulfillment: r.expr(wanted).contains(fulfillment['input']))))
+
     def get_owned_ids(self, owner):
         """Retrieve a list of `txids` that can we used has inputs.
 
@@ -246,10 +492,9 @@ class RethinkDBBackend:
         Returns:
             A cursor for the matching transactions.
         """
-        # print(owner)
-        # TODO: use index!
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
+                .get_all(owner, index='owners_after')
                 .concat_map(lambda doc: doc['block']['transactions'])
                 .filter(lambda tx: tx['transaction']['conditions'].contains(
                 lambda c: c['owners_after'].contains(owner))))
@@ -300,7 +545,7 @@ class RethinkDBBackend:
         # print(owner)
         # TODO: use index!
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
                 .concat_map(lambda doc: doc['block']['transactions']).filter(
                 lambda tx: tx['transaction']['Relation']['ContractHashId'] == contract_hash_id))
 
@@ -314,7 +559,7 @@ class RethinkDBBackend:
             A cursor for the matching votes.
         """
         return self.connection.run(
-            r.table('votes', read_mode=self.read_mode)
+            self._votes
                 .between([block_id, r.minval], [block_id, r.maxval], index='block_and_voter'))
 
     def get_votes_by_block_id_and_voter(self, block_id, node_pubkey):
@@ -328,21 +573,35 @@ class RethinkDBBackend:
             A cursor for the matching votes.
         """
         return self.connection.run(
-            r.table('votes', read_mode=self.read_mode)
+            self._votes
                 .get_all([block_id, node_pubkey], index='block_and_voter'))
 
     def write_block(self, block, durability='soft'):
         """Write a block to the bigchain table.
 
         Args:
-            block (dict): the block to write.
+            block (str): the serialized block to write.
 
         Returns:
             The database response.
         """
-        return self.connection.run(
+        return self.write_blocks([block], durability=durability)
+
+    def write_blocks(self, blocks, durability='soft'):
+        """Write several blocks to the bigchain table in a single insert.
+
+        Args:
+            blocks (list): the blocks to write, either serialized or as dicts.
+
+        Returns:
+            The database response.
+        """
+        response = self.connection.run(
             r.table('bigchain')
-                .insert(r.json(block), durability=durability))
+                .insert([r.json(block) if isinstance(block, str) else block for block in blocks],
+                        durability=durability))
+        self.cache.pop(('count_blocks',))
+        return response
 
     def has_transaction(self, transaction_id):
         """Check if a transaction exists in the bigchain table.
@@ -353,9 +612,11 @@ class RethinkDBBackend:
         Returns:
             ``True`` if the transaction exists, ``False`` otherwise.
         """
-        return bool(self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
-                .get_all(transaction_id, index='transaction_id').count()))
+        return self._cached(
+            ('has_transaction', transaction_id),
+            lambda: not self.connection.run(
+                self._bigchain
+                    .get_all(transaction_id, index='transaction_id').limit(1).is_empty()))
 
     def has_transactions_list(self, transactions):
         return self.connection.run(
@@ -368,9 +629,12 @@ class RethinkDBBackend:
             The number of blocks.
         """
 
-        return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
-                .count())
+        return self._cached(
+            ('count_blocks',),
+            lambda: self.connection.run(
+                self._bigchain
+                    .count()),
+            ttl=self._count_cache_ttl(), cache_falsy=True)
 
     def count_blocks_by_node_pubkey(self,node_pubkey):
         """Count the number of blocks in the bigchain table.
@@ -379,7 +643,7 @@ class RethinkDBBackend:
             The number of blocks.
         """
 
-        return self.connection.run(r.table('bigchain', read_mode=self.read_mode).filter(r.row['block']['node_pubkey'] == node_pubkey).count())
+        return self.connection.run(self._bigchain.filter(r.row['block']['node_pubkey'] == node_pubkey).count())
 
     def count_valid_blocks(self):
         """Count the number of blocks in the bigchain table.
@@ -447,12 +711,12 @@ class RethinkDBBackend:
         """
 
         return self.connection.run(
-            r.table('votes', read_mode=self.read_mode)
+            self._votes
                 .count())
 
     def count_votes_by_node_pubkey(self,node_pubkey):
         return self.connection.run(
-            r.table('votes', read_mode=self.read_mode).filter(r.row['node_pubkey'] == node_pubkey)
+            self._votes.filter(r.row['node_pubkey'] == node_pubkey)
                 .count())
 
     def count_backlog_txs(self):
@@ -462,9 +726,12 @@ class RethinkDBBackend:
             The number of txs.
         """
         # TODO need update ?
-        return self.connection.run(
-            r.table('backlog', read_mode=self.read_mode)
-                .count())
+        return self._cached(
+            ('count_backlog_txs',),
+            lambda: self.connection.run(
+                r.table('backlog', read_mode=self.read_mode)
+                    .count()),
+            ttl=self._count_cache_ttl(), cache_falsy=True)
 
     def write_vote(self, vote):
         """Write a vote to the votes table.
@@ -489,22 +756,28 @@ class RethinkDBBackend:
             The last block the node has voted on. If the node didn't cast
             any vote then the genesis block is returned.
         """
-        try:
-            # get the latest value for the vote timestamp (over all votes)
-            max_timestamp = self.connection.run(
-                r.table('votes', read_mode=self.read_mode)
-                    .filter(r.row['node_pubkey'] == node_pubkey)
-                    .max(r.row['vote']['timestamp']))['vote']['timestamp']
-
-            last_voted = list(self.connection.run(
-                r.table('votes', read_mode=self.read_mode)
-                    .filter(r.row['vote']['timestamp'] == max_timestamp)
-                    .filter(r.row['node_pubkey'] == node_pubkey)))
-
-        except r.ReqlNonExistenceError:
+        votes = self._votes
+
+        # get all the votes of the node sharing the latest timestamp in a
+        # single query, the votes are read in timestamp order from the index
+        last_voted = self.connection.run(
+            votes.between([node_pubkey, r.minval], [node_pubkey, r.maxval], index='node_and_ts')
+                .order_by(index=r.desc('node_and_ts'))
+                .limit(1)
+                .coerce_to('array')
+                .do(lambda last: r.branch(
+                    last.is_empty(),
+                    [],
+                    votes.between([node_pubkey, last[0]['vote']['timestamp']],
+                                  [node_pubkey, last[0]['vote']['timestamp']],
+                                  index='node_and_ts', right_bound='closed')
+                        .pluck({'vote': ['previous_block', 'voting_for_block']})
+                        .coerce_to('array'))))
+
+        if not last_voted:
             # return last vote if last vote exists else return Genesis block
             return self.connection.run(
-                r.table('bigchain', read_mode=self.read_mode)
+                self._bigchain
                     .filter(util.is_genesis_block)
                     .nth(0))
 
@@ -519,7 +792,7 @@ class RethinkDBBackend:
 
         # Since we follow the chain backwards, we can start from a random
         # point of the chain and "move up" from it.
-        last_block_id = list(mapping.values())[0]
+        last_block_id = next(iter(mapping.values()))
 
         # We must be sure to break the infinite loop. This happens when:
         # - the block we are currenty iterating is the one we are looking for.
@@ -539,7 +812,7 @@ class RethinkDBBackend:
                 break
 
         return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
+            self._bigchain
                 .get(last_block_id))
 
     def get_unvoted_blocks(self, node_pubkey):
@@ -552,79 +825,91 @@ class RethinkDBBackend:
             :obj:`list` of :obj:`dict`: a list of unvoted blocks
         """
 
-        unvoted = self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
-                .filter(lambda block: r.table('votes', read_mode=self.read_mode)
+        # same rules as `util.need_vote_block`: the node must be a voter of
+        # the block, and the genesis block is never voted
+        return self.connection.run(
+            self._bigchain
+                .filter(lambda block: block['block']['voters'].contains(node_pubkey)
+                        & block['block']['transactions'][0]['transaction']['operation'].ne('GENESIS')
+                        & self._votes
                         .get_all([block['id'], node_pubkey], index='block_and_voter')
                         .is_empty())
                 .order_by(r.asc(r.row['block']['timestamp'])))
 
-        # FIXME: I (@vrde) don't like this solution. Filtering should be done at a
-        #        database level. Solving issue #444 can help untangling the situation
-        # unvoted_blocks = filter(lambda block: not util.is_genesis_block(block), unvoted)
-        unvoted_blocks = filter(lambda block: util.need_vote_block(block, node_pubkey), unvoted)
-        return unvoted_blocks
-
     # TODO 需要写一些通用方法，提高代码重用
 
     def delete_heartbeat(self, node_pubkey):
-        return self.connection.run(r.table('heartbeat').filter({'node_publickey': node_pubkey}).delete())
+        return self.connection.run(r.table('heartbeat').get_all(node_pubkey, index='node_publickey').delete())
+
+    # The periodic heartbeat and assignee timestamp updates are keep-alives
+    # whose result is never used: they are sent with `noreply` so that the
+    # caller does not wait for the server acknowledgement. The rows they
+    # update are created and reassigned with acknowledged writes, since they
+    # are read right after.
 
     def init_heartbeat(self, data):
         return self.connection.run(r.table('heartbeat').insert(data))
 
     def isReassignnodeExist(self):
-        return self.connection.run(r.table('reassignnode').count())
+        return self.connection.run(r.table('reassignnode').limit(1).is_empty().not_())
 
     def init_reassignnode(self, data):
         return self.connection.run(r.table('reassignnode').insert(data))
 
     def updateHeartbeat(self, node_pubkey, time):
         return self.connection.run(
-            r.table('heartbeat').filter({'node_publickey': node_pubkey}).update({'timestamp': time}, durability='hard'))
+            r.table('heartbeat').get_all(node_pubkey, index='node_publickey').update({'timestamp': time},
+                                                                                   durability='soft'),
+            noreply=True)
 
     def getAssigneekey(self):
         return self.connection.run(r.table('reassignnode'))
 
     def updateAssigneebeat(self, node_pubkey, time):
         return self.connection.run(
-            r.table('reassignnode').filter({'node_publickey': node_pubkey}).update({'timestamp': time}))
+            r.table('reassignnode').get_all(node_pubkey, index='node_publickey').update({'timestamp': time},
+                                                                                      durability='soft'),
+            noreply=True)
 
     def is_assignee_alive(self, assigneekey):
-        return self.connection.run(r.table('reassignnode').filter({'node_publickey': assigneekey}))
+        return self.connection.run(r.table('reassignnode').get_all(assigneekey, index='node_publickey'))
 
     def is_node_alive(self, txpublickey):
         return self.connection.run(
-            r.table('heartbeat', read_mode=self.read_mode).filter({'node_publickey': txpublickey}))
+            r.table('heartbeat', read_mode=self.read_mode).get_all(txpublickey, index='node_publickey'))
 
     def update_assign_node(self, updateid, next_assign_node):
         return self.connection.run(r.table('reassignnode').update(
             {"nodeid": updateid, 'node_publickey': next_assign_node, 'timestamp': time()}))
 
     def insertRewrite(self, data):
-        return self.connection.run(r.table('rewrite').insert(data))
+        response = self.connection.run(r.table('rewrite').insert(data))
+        self.cache.pop(('block', data['id']), ('block_by_id', data['id']),
+                       ('txNumberById', data['id']))
+        return response
 
     def isBlockRewrited(self, id):
-        return self.connection.run(r.table('rewrite').filter({'id': id}).count())
+        # `id` is the primary key of the rewrite table
+        return self.connection.run(r.table('rewrite').get(id).ne(None))
 
     ##############################################
     ####    unichain api query method     ########
     ##############################################
     def get_block_by_id(self, block_id):
         # return self.connection.run(r.table('bigchain', read_mode=self.read_mode).filter({'id':block_id}))
-        return self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode)
-                .get(block_id))
+        return self._cached(
+            ('block_by_id', block_id),
+            lambda: self.connection.run(
+                self._bigchain
+                    .get(block_id)))
 
     def get_transaction_createavgtime_by_range(self, begintime, endtime):
         time_range = int(endtime) - int(begintime)
         if time_range < 0:
             return 0, False
-        # transaction_count =  self.connection.run(
-        #     r.table('bigchain', read_mode=self.read_mode)
-        #      .between(begintime, endtime, index='tx_timestamp').count())  # tx time
         transaction_count = self.connection.run(
-            r.table("bigchain").concat_map(lambda block: block['block']['transactions']).filter(
+            self._blocks_by_tx_timestamp(begintime, endtime, left_bound='open')
+                .concat_map(lambda block: block['block']['transactions']).filter(
                 (r.row["transaction"]['timestamp'] > begintime) & (
                     r.row["transaction"]['timestamp'] < endtime)).count())
         if not transaction_count:
@@ -637,7 +922,7 @@ class RethinkDBBackend:
         time_range = int(endtime) - int(begintime)
         if time_range < 0:
             return 0, False
-        block_count = self.connection.run(r.table('bigchain', read_mode=self.read_mode).between(begintime, endtime,
+        block_count = self.connection.run(self._bigchain.between(begintime, endtime,
                                                                                                 index='block_timestamp').count())  # block time
         if not block_count:
             return 0, False
@@ -646,11 +931,13 @@ class RethinkDBBackend:
         return round(time_range / block_count, 3), True
 
     def get_vote_time_by_blockid(self, block_id):
-        vote_begin_time = self.connection.run(
-            r.table('bigchain', read_mode=self.read_mode).get(block_id).get_field('block').get_field('timestamp'))
-        vote_end_time = self.connection.run(r.table('votes').filter(r.row['vote']['voting_for_block'] == block_id).max(
-            r.row['vote']['timestamp']).get_field('vote').get_field('timestamp'))
-        vote_time = int(vote_end_time) - int(vote_begin_time)
+        # read the block timestamp and the latest vote timestamp in one query
+        times = self.connection.run(r.expr({
+            'begin': self._bigchain.get(block_id)['block']['timestamp'],
+            'end': self._votes.between([block_id, r.minval], [block_id, r.maxval], index='block_and_voter')
+                .max(r.row['vote']['timestamp'])['vote']['timestamp']
+        }))
+        vote_time = int(times['end']) - int(times['begin'])
         if not vote_time:
             vote_time = 1
         return vote_time, True
@@ -660,7 +947,7 @@ class RethinkDBBackend:
         if time_range < 0:
             return 0, False
         vote_count = self.connection.run(
-            r.table('votes', read_mode=self.read_mode).between(begintime, endtime, index='vote_timestamp').get_field(
+            self._votes.between(begintime, endtime, index='vote_timestamp').get_field(
                 'vote').get_field('voting_for_block').distinct().count())
         if not vote_count:
             return 0, False
@@ -678,8 +965,10 @@ class RethinkDBBackend:
         :return:
         """
 
-        return self.connection.run(r.table('bigchain').get_all(block_id, index='id').concat_map(
-            lambda block: block['block']['transactions']).count())
+        return self._cached(
+            ('txNumberById', block_id),
+            lambda: self.connection.run(
+                r.table('bigchain').get(block_id)['block']['transactions'].count().default(0)))
 
     def get_txNumber(self, startTime=r.minval, endTime=r.maxval):
         """Get the numbers of the special block by the index block_timestamp.
@@ -692,17 +981,19 @@ class RethinkDBBackend:
 
         return self.connection.run(r.table('bigchain').between(
             startTime, endTime, index='block_timestamp', left_bound='closed',
-            right_bound='closed').map(lambda block: block['block']['transactions'].count()).sum())
+            right_bound='closed').sum(lambda block: block['block']['transactions'].count()))
 
     def get_BlockNumber(self, startTime=r.minval, endTime=r.maxval):
         return self.connection.run(r.table('bigchain').between(startTime, endTime, index="block_timestamp").count())
 
     def get_allInvalidBlock(self, limit=None):
+        # ordering on the index streams the ids instead of sorting whole rows
         if limit == None:
-            return self.connection.run(r.table('rewrite').order_by(r.desc(r.row['timestamp'])).get_field('id'))
+            return self.connection.run(
+                r.table('rewrite').order_by(index=r.desc('block_timestamp')).get_field('id'))
         else:
             return self.connection.run(
-                r.table('rewrite').order_by(r.desc(r.row['timestamp'])).get_field('id').limit(1000))
+                r.table('rewrite').order_by(index=r.desc('block_timestamp')).get_field('id').limit(1000))
 
     def get_allInvalidBlock_number(self, startTime=r.minval, endTime=r.maxval):
         return self.connection.run(r.table('rewrite').between(startTime, endTime, index="block_timestamp").count())
@@ -727,18 +1018,33 @@ class RethinkDBBackend:
                 r.table('bigchain').between(startTime, endTime, index='block_timestamp').order_by(
                     index=r.desc('block_timestamp')).get_field('id').limit(limit))
 
+    def _blocks_by_tx_timestamp(self, start, end, left_bound='closed', right_bound='open'):
+        """Select the blocks holding transactions timestamped in a range.
+
+        A block is found once per matching transaction on the `tx_timestamp`
+        multi index, so the block ids are deduplicated before the blocks are
+        read.
+
+        Returns:
+            The ReQL selection of the blocks.
+        """
+        blocks = self._bigchain
+        return blocks.get_all(r.args(
+            blocks.between(start, end, index='tx_timestamp',
+                           left_bound=left_bound, right_bound=right_bound)
+                .get_field('id').distinct().coerce_to('array')))
+
     def get_txIdList(self, startTime=r.minval, endTime=r.maxval, limit=None):
+        # filter before sorting so that only the transactions in the range
+        # are held by the server for the order_by
+        transactions = self._blocks_by_tx_timestamp(startTime, endTime, right_bound='closed').concat_map(
+            lambda block: block['block']['transactions']).filter(
+            (r.row["transaction"]['timestamp'] >= startTime) & (r.row["transaction"]['timestamp'] <= endTime)).order_by(
+            r.desc(r.row['transaction']['timestamp']))
         if limit == None:
-            return self.connection.run(
-                r.table("bigchain").concat_map(lambda block: block['block']['transactions']).order_by(
-                    r.desc(r.row['block']['transactions']['transaction']['timestamp'])).filter(
-                    (r.row["transaction"]['timestamp'] >= startTime) & (r.row["transaction"]['timestamp'] <= endTime)))
+            return self.connection.run(transactions)
         else:
-            return self.connection.run(
-                r.table("bigchain").concat_map(lambda block: block['block']['transactions']).order_by(
-                    r.desc(r.row['block']['transactions']['transaction']['timestamp'])).filter(
-                    (r.row["transaction"]['timestamp'] >= startTime) & (
-                        r.row["transaction"]['timestamp'] <= endTime)).limit(limit))
+            return self.connection.run(transactions.limit(limit))
 
     def get_txNumberOfEachBlock(self, limit=None):
         if limit == None:
@@ -749,7 +1055,9 @@ class RethinkDBBackend:
                 {'id': r.row['id'], 'count': r.row['block']['transactions'].count()}).limit(limit))
 
     def get_block(self, block_id):
-        return self.connection.run(r.table('bigchain').get(block_id))
+        return self._cached(
+            ('block', block_id),
+            lambda: self.connection.run(r.table('bigchain').get(block_id)))
 
     def get_tx_by_id(self, tx_id):
         return self.connection.run(r.table('bigchain').get_all(tx_id, index='transaction_id'))
@@ -834,7 +1142,7 @@ class RethinkDBBackend:
                                    .get_field("transaction").get_field("Contract"))
 
     def get_contract_txs_by_id(self, tx_id):
-        return self.connection.run(r.table('bigchain', read_mode=self.read_mode).get_all(tx_id, index='transaction_id'))
+        return self.connection.run(self._bigchain.get_all(tx_id, index='transaction_id'))
 
     # for border trade start
     # order
@@ -1,25 +1,231 @@
 """Utils to initialize and drop the database."""
 
+import os
 import time
 import logging
+import weakref
+import threading
+import collections
 
+import rapidjson
 from bigchaindb.common import exceptions
 import rethinkdb as r
+from rethinkdb.net import Cursor, ReQLDecoder
 
 import bigchaindb
 
 logger = logging.getLogger(__name__)
 
 
+class RapidJSONDecoder(ReQLDecoder):
+    """Decode the query responses with rapidjson instead of the pure Python
+    ``json`` module, still converting the ReQL pseudo types (times, binary
+    and grouped data) like the default decoder does.
+
+    The responses rapidjson rejects, such as the ones holding a number too
+    big for a double, are decoded by the default decoder, which reads them
+    as ``inf``.
+    """
+
+    def decode(self, s):
+        try:
+            return rapidjson.loads(s, object_hook=self.convert_pseudotype)
+        except ValueError:
+            return super().decode(s)
+
+
+class ConnectionPool:
+    """A pool of RethinkDB connections shared by the threads of a process.
+
+    Connections are opened on demand and handed back to the pool once a
+    query has been run. At most ``max_size`` connections are checked out at
+    once, the other callers wait up to ``acquire_timeout`` seconds for one to
+    be given back, so the pool never holds more than ``max_size``
+    connections. The ones idle for more than ``idle_timeout`` seconds are
+    closed by a background thread, down to ``min_size`` connections.
+    """
+
+    def __init__(self, host, port, db, min_size=1, max_size=100,
+                 idle_timeout=60, max_tries=3, acquire_timeout=30):
+        self.host = host
+        self.port = port
+        self.db = db
+        self.min_size = min_size
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.max_tries = max_tries
+        self.acquire_timeout = acquire_timeout
+        # idle connections with their last release time, the most recently
+        # used ones are on the right
+        self.idle = collections.deque()
+        self.lock = threading.Lock()
+        self.slots = threading.BoundedSemaphore(max_size)
+        self.reaper = None
+
+    def acquire(self):
+        """Check out an idle connection, or a new one if none is available.
+
+        Raises:
+            ReqlDriverError: if no connection was given back to the pool
+                within ``acquire_timeout`` seconds.
+        """
+
+        if not self.slots.acquire(timeout=self.acquire_timeout):
+            raise r.ReqlDriverError('No connection available in the pool of {}:{}/{}'
+                                    .format(self.host, self.port, self.db))
+        try:
+            with self.lock:
+                if self.idle:
+                    return self.idle.pop()[0]
+            self._start_reaper()
+            return self._connect()
+        except BaseException:
+            self.slots.release()
+            raise
+
+    def release(self, conn):
+        """Give back a healthy checked out connection to the pool."""
+
+        with self.lock:
+            self.idle.append((conn, time.monotonic()))
+        self.slots.release()
+
+    def discard(self, conn):
+        """Close a checked out connection instead of giving it back."""
+
+        self._close(conn)
+        self.slots.release()
+
+    def evict_idle(self):
+        """Close the connections that have been idle for too long."""
+
+        expired = []
+        deadline = time.monotonic() - self.idle_timeout
+        with self.lock:
+            while len(self.idle) > self.min_size and self.idle[0][1] < deadline:
+                expired.append(self.idle.popleft()[0])
+        for conn in expired:
+            # let the `noreply` writes sent on it land first
+            self._close(conn, noreply_wait=True)
+
+    @staticmethod
+    def _close(conn, noreply_wait=False):
+        try:
+            conn.close(noreply_wait=noreply_wait)
+        except r.ReqlDriverError:
+            pass
+
+    def _start_reaper(self):
+        if self.reaper is not None:
+            return
+
+        def reap():
+            while True:
+                time.sleep(self.idle_timeout)
+                self.evict_idle()
+
+        with self.lock:
+            if self.reaper is None:
+                self.reaper = threading.Thread(target=reap, name='rethinkdb-pool-reaper', daemon=True)
+                self.reaper.start()
+
+    def _connect(self):
+        for i in range(self.max_tries):
+            try:
+                return r.connect(host=self.host, port=self.port, db=self.db,
+                                 json_decoder=RapidJSONDecoder)
+            except r.ReqlDriverError as exc:
+                if i + 1 == self.max_tries:
+                    raise
+                else:
+                    time.sleep(2 ** i)
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(host, port, db, min_size, max_size, max_tries=3):
+    """Return the connection pool of this process for a database.
+
+    Pools are keyed by process id too: connections must not be shared by
+    the processes forked by the pipelines.
+    """
+
+    key = (os.getpid(), host, port, db)
+    with _pools_lock:
+        pool = _pools.get(key)
+        if pool is not None:
+            return pool
+        pool = _pools[key] = ConnectionPool(host, port, db, min_size=min_size,
+                                            max_size=max_size, max_tries=max_tries)
+        return pool
+
+
+def _end_cursor_lease(pool, conn, cursor, exhausted):
+    if exhausted[0]:
+        pool.release(conn)
+        return
+    try:
+        cursor.close()
+    except r.ReqlError:
+        pass
+    # the responses to a stopped cursor may still be on their way
+    pool.discard(conn)
+
+
+class PooledCursor:
+    """A cursor holding its pooled connection until it is read to the end,
+    closed, or garbage collected.
+
+    The driver keeps a reference to every cursor which is not read to the
+    end, so the connection cannot be released when the cursor itself is
+    collected: it is released when this wrapper is. A cursor dropped before
+    its end is closed and its connection discarded.
+    """
+
+    def __init__(self, cursor, pool, conn):
+        self.cursor = cursor
+        self._exhausted = [False]
+        self._end_lease = weakref.finalize(self, _end_cursor_lease, pool, conn,
+                                           cursor, self._exhausted)
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return self.next()
+
+    def next(self, wait=True):
+        try:
+            return self.cursor.next(wait)
+        except StopIteration:
+            self._exhausted[0] = True
+            self._end_lease()
+            raise
+
+    def close(self):
+        """Close the cursor and give back its connection."""
+
+        self._end_lease()
+
+    def __getattr__(self, name):
+        return getattr(self.cursor, name)
+
+
 class Connection:
     """This class is a proxy to run queries against the database,
     it is:
     - lazy, since it creates a connection only when needed
     - resilient, because before raising exceptions it tries
       more times to run the query or open a connection.
+    - pooled, since connections are borrowed from a pool shared by all the
+      threads of the process, so concurrent queries do not wait for each
+      other nor open a new socket.
     """
 
-    def __init__(self, host=None, port=None, db=None, max_tries=3):
+    def __init__(self, host=None, port=None, db=None, max_tries=3,
+                 pool_min=None, pool_max=None):
         """Create a new Connection instance.
 
         Args:
@@ -27,43 +233,51 @@ class Connection:
             port (int, optional): the port to connect to.
             db (str, optional): the database to use.
             max_tries (int, optional): how many tries before giving up.
+            pool_min (int, optional): how many idle connections to keep open
+                once they have been opened.
+            pool_max (int, optional): the maximum number of connections in
+                use at once.
         """
 
         self.host = host or bigchaindb.config['database']['host']
         self.port = port or bigchaindb.config['database']['port']
         self.db = db or bigchaindb.config['database']['name']
         self.max_tries = max_tries
-        self.conn = None
+        self.pool_min = pool_min or bigchaindb.config['database']['pool_min']
+        self.pool_max = pool_max or bigchaindb.config['database']['pool_max']
+
+    @property
+    def pool(self):
+        return get_pool(self.host, self.port, self.db, self.pool_min,
+                        self.pool_max, max_tries=self.max_tries)
 
-    def run(self, query):
+    def run(self, query, **kwargs):
         """Run a query.
 
         Args:
             query: the RethinkDB query.
+            **kwargs: the options passed to ``query.run``.
         """
 
-        if self.conn is None:
-            self._connect()
-
+        pool = self.pool
         for i in range(self.max_tries):
+            conn = pool.acquire()
             try:
-                return query.run(self.conn)
+                result = query.run(conn, **kwargs)
             except r.ReqlDriverError as exc:
+                pool.discard(conn)
                 if i + 1 == self.max_tries:
                     raise
-                else:
-                    self._connect()
+                continue
+            except Exception:
+                pool.release(conn)
+                raise
 
-    def _connect(self):
-        for i in range(self.max_tries):
-            try:
-                self.conn = r.connect(host=self.host, port=self.port,
-                                      db=self.db)
-            except r.ReqlDriverError as exc:
-                if i + 1 == self.max_tries:
-                    raise
-                else:
-                    time.sleep(2 ** i)
+            if isinstance(result, Cursor):
+                # the cursor still reads from the connection
+                return PooledCursor(result, pool, conn)
+            pool.release(conn)
+            return result
 
 
 def get_backend(host=None, port=None, db=None):
@@ -83,7 +297,8 @@ def get_conn():
 
     return r.connect(host=bigchaindb.config['database']['host'],
                      port=bigchaindb.config['database']['port'],
-                     db=bigchaindb.config['database']['name'])
+                     db=bigchaindb.config['database']['name'],
+                     json_decoder=RapidJSONDecoder)
 
 
 def get_database_name():
@@ -125,16 +340,78 @@ def create_bigchain_secondary_index(conn, dbname):
         .index_create('asset_id',
                       r.row['block']['transactions']['transaction']['asset']['id'], multi=True) \
         .run(conn)
-    r.db(dbname).table('bigchain') \
-        .index_create('tx_timestamp',
-                      r.row['block']['transactions']['transaction']['timestamp']) \
-        .run(conn)
     r.db(dbname).table('rewrite').index_create('block_timestamp', r.row['timestamp']).run(conn)
 
     # wait for rethinkdb to finish creating secondary indexes
     r.db(dbname).table('bigchain').index_wait().run(conn)
 
 
+def spent_inputs_index(block):
+    """Index a block by the ``[txid, cid]`` inputs its transactions spend."""
+
+    return block['block']['transactions'] \
+        .concat_map(lambda tx: tx['transaction']['fulfillments'].default([])) \
+        .filter(lambda ffill: ffill['input'].default(None).ne(None)) \
+        .map(lambda ffill: [ffill['input']['txid'], ffill['input']['cid']]) \
+        .distinct()
+
+
+def owners_after_index(block):
+    """Index a block by the owners of the conditions of its transactions."""
+
+    return block['block']['transactions'] \
+        .concat_map(lambda tx: tx['transaction']['conditions'].default([])) \
+        .concat_map(lambda condition: condition['owners_after'].default([])) \
+        .distinct()
+
+
+# Secondary indexes added after the database schema was first released.
+# They are created on new databases by ``init_database`` and back-filled on
+# existing ones by ``migrate``.
+MIGRATED_INDEXES = {
+    'bigchain': [
+        ('spent_inputs', spent_inputs_index, {'multi': True}),
+        ('owners_after', owners_after_index, {'multi': True}),
+        # to query the transactions by timestamp, it used to be created
+        # without `multi` and indexed the whole array of timestamps
+        ('tx_timestamp', r.row['block']['transactions']['transaction']['timestamp'], {'multi': True}),
+    ],
+    'votes': [
+        # compound index to order the votes of a node by timestamp
+        ('node_and_ts', [r.row['node_pubkey'], r.row['vote']['timestamp']], {}),
+    ],
+    # the keep-alive rows are read and updated per node
+    'heartbeat': [
+        ('node_publickey', r.row['node_publickey'], {}),
+    ],
+    'reassignnode': [
+        ('node_publickey', r.row['node_publickey'], {}),
+    ],
+}
+
+
+def create_migrated_secondary_indexes(conn, dbname):
+    """Create the indexes of ``MIGRATED_INDEXES`` missing from the database,
+    and the ones whose definition changed."""
+
+    for table_name, indexes in MIGRATED_INDEXES.items():
+        table = r.db(dbname).table(table_name)
+        existing = table.index_list().run(conn)
+        for index_name, index_func, options in indexes:
+            if index_name in existing:
+                status = table.index_status(index_name).nth(0).run(conn)
+                if status['multi'] == options.get('multi', False):
+                    continue
+                logger.info('Recreate `%s` secondary index `%s`.', table_name, index_name)
+                table.index_drop(index_name).run(conn)
+            else:
+                logger.info('Create `%s` secondary index `%s`.', table_name, index_name)
+            table.index_create(index_name, index_func, **options).run(conn)
+
+        # wait for rethinkdb to back-fill the secondary indexes
+        table.index_wait().run(conn)
+
+
 def create_backlog_secondary_index(conn, dbname):
     logger.info('Create `backlog-s` secondary index.')
     splitbacklog = bigchaindb.config['argument_config']['split_backlog']
@@ -202,6 +479,13 @@ def init_database():
     create_bigchain_secondary_index(conn, dbname)
     create_backlog_secondary_index(conn, dbname)
     create_votes_secondary_index(conn, dbname)
+    create_migrated_secondary_indexes(conn, dbname)
+
+
+def migrate():
+    """Bring the schema of an existing database up to date."""
+
+    create_migrated_secondary_indexes(get_conn(), get_database_name())
 
 
 def init_databaseData():
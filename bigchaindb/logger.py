@@ -1,7 +1,10 @@
 
 import os
+import queue
+import atexit
 import datetime
 import logging.config
+import logging.handlers
 import bigchaindb
 
 app_service_name = bigchaindb.config['app']['service_name']
@@ -16,6 +19,29 @@ if not os.path.exists(LOG_DIR):
     os.makedirs(LOG_DIR) 
 PRO_LOG_FILE = "{}.log.{}".format(app_service_name, datetime.datetime.now().strftime("%Y%m%d%H%M%S"))
 
+
+class SampledRotatingFileHandler(logging.handlers.RotatingFileHandler):
+    """A RotatingFileHandler looking at the file size once every
+    ``check_interval`` records instead of on every record.
+
+    Each record is still flushed when written: nothing is left in the stream
+    buffer for a forked process to write again, or to lose on a hard exit.
+    """
+
+    def __init__(self, *args, check_interval=1000, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.check_interval = check_interval
+        self.unchecked = 0
+
+    def shouldRollover(self, record):
+        # called with the handler lock held
+        self.unchecked += 1
+        if self.unchecked < self.check_interval:
+            return 0
+        self.unchecked = 0
+        return super().shouldRollover(record)
+
+
 ##log conf
 LOG_CONF = {
     "version": 1,
@@ -36,13 +62,14 @@ LOG_CONF = {
             "stream": "ext://sys.stdout"
         },
         "pro": {
-            "class": "logging.handlers.RotatingFileHandler",
+            "class": "bigchaindb.logger.SampledRotatingFileHandler",
             "level": debug_to_file,
             "formatter": "standard",
             "filename": os.path.join(LOG_DIR, PRO_LOG_FILE),
             'mode': 'w+',
             "maxBytes": 1024*1024*512,
             "backupCount": 20,
+            "check_interval": 1000,
             "encoding": "utf8"
         }
     },
@@ -61,4 +88,99 @@ LOG_CONF = {
 }
 # root is in use
 
+
+class BoundedQueueListener(logging.handlers.QueueListener):
+    """A QueueListener that can be stopped while its queue is full.
+
+    It only passes a record to the handlers whose level it reaches, like
+    ``respect_handler_level=True`` which is not available before Python 3.5.
+    """
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+    def handle(self, record):
+        record = self.prepare(record)
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+class BackgroundQueueHandler(logging.handlers.QueueHandler):
+    """Hand the records over to a thread writing them to ``targets``.
+
+    Logging calls only put the record in a queue, they no longer wait for
+    the file and console writes. The listener thread does not survive a
+    fork, so it is restarted when the handler is used in a child process
+    (the pipelines run in forked processes).
+
+    The queue holds at most ``maxsize`` records: when the writes cannot keep
+    up, the new records are dropped rather than stalling the callers. The
+    number of dropped records is logged as soon as the queue has room again,
+    or when the handler is stopped.
+    """
+
+    def __init__(self, *targets, maxsize=100000):
+        self.maxsize = maxsize
+        self.dropped = 0
+        super().__init__(queue.Queue(maxsize))
+        self.targets = targets
+        self.start()
+
+    def start(self):
+        self.pid = os.getpid()
+        self.listener = BoundedQueueListener(self.queue, *self.targets)
+        self.listener.start()
+
+    def stop(self):
+        if self.pid == os.getpid():
+            if self.dropped:
+                self.acquire()
+                try:
+                    self.report_dropped(block=True)
+                finally:
+                    self.release()
+            self.listener.stop()
+
+    def report_dropped(self, block=False):
+        # called with the handler lock held, raises queue.Full when the
+        # queue is still full and block is False
+        record = logging.makeLogRecord({
+            'name': __name__,
+            'levelno': logging.WARNING,
+            'levelname': logging.getLevelName(logging.WARNING),
+            'msg': '%s log records were dropped, the log queue was full',
+            'args': (self.dropped,),
+        })
+        self.queue.put(self.prepare(record), block)
+        self.dropped = 0
+
+    def enqueue(self, record):
+        # called with the handler lock held
+        if self.pid != os.getpid():
+            self.queue = queue.Queue(self.maxsize)
+            self.dropped = 0
+            self.start()
+        try:
+            if self.dropped:
+                self.report_dropped()
+            super().enqueue(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def use_background_handler(*loggers):
+    """Move the handlers of ``loggers`` behind a single BackgroundQueueHandler."""
+
+    targets = []
+    for log in loggers:
+        targets.extend(handler for handler in log.handlers if handler not in targets)
+    handler = BackgroundQueueHandler(*targets)
+    for log in loggers:
+        log.handlers = [handler]
+    atexit.register(handler.stop)
+    return handler
+
+
 logging.config.dictConfig(LOG_CONF)
+use_background_handler(logging.getLogger(), logging.getLogger('unichain'))
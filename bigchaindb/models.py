@@ -1,6 +1,8 @@
 import logging
+import functools
+import multiprocessing
+from concurrent.futures import wait, FIRST_EXCEPTION
 
-from copy import deepcopy
 from bigchaindb.common.crypto import hash_data, VerifyingKey, SigningKey
 from bigchaindb.common.exceptions import (InvalidHash, InvalidSignature,
                                           OperationError, DoubleSpend,
@@ -11,9 +13,68 @@ from bigchaindb.common.exceptions import (InvalidHash, InvalidSignature,
                                           MutilcontractNode)
 from bigchaindb.common.transaction import Transaction, Asset
 from bigchaindb.common.util import gen_timestamp, serialize
+from bigchaindb.util import TTLCache, get_process_pool
 
 logger = logging.getLogger(__name__)
 
+# The transactions of a block are validated in the process pool of
+# `bigchaindb.util`, each worker using its own Bigchain instance.
+_worker_bigchain = None
+
+# Transactions are validated again when a block is reprocessed: the outcome
+# of the signature checks is remembered per transaction, signatures and
+# input conditions. Only the successful checks are kept.
+VALID_FULFILLMENTS_MAXSIZE = 100000
+_valid_fulfillments = TTLCache(maxsize=VALID_FULFILLMENTS_MAXSIZE)
+
+# same for the signatures of the blocks, e.g. when a block is validated
+# again after a restart of the vote pipeline
+VALID_BLOCK_SIGNATURES_MAXSIZE = 10000
+_valid_block_signatures = TTLCache(maxsize=VALID_BLOCK_SIGNATURES_MAXSIZE)
+
+
+# the keys of the federation nodes and contract owners verify signatures
+# over and over: the key objects are built once per key
+@functools.lru_cache(maxsize=1024)
+def _verifying_key(public_key):
+    return VerifyingKey(public_key)
+
+
+@functools.lru_cache(maxsize=16)
+def _signing_key(private_key):
+    return SigningKey(private_key)
+
+
+def _verify_block_signature(node_pubkey, signature, block_serialized, block_id):
+    """Check the signature of a serialized block body by ``node_pubkey``."""
+
+    # the id is the hash of the signed body, so a signature already
+    # verified for this id does not need to be verified again
+    key = (block_id, signature)
+    if _valid_block_signatures.get(key):
+        return True
+    verifying_key = _verifying_key(node_pubkey)
+    try:
+        # NOTE: CC throws a `ValueError` on some wrong signatures
+        #       https://github.com/bigchaindb/cryptoconditions/issues/27
+        # cc only accepts bytesting messages
+        valid = verifying_key.verify(block_serialized.encode(), signature)
+    except (ValueError, AttributeError):
+        return False
+    if valid:
+        _valid_block_signatures.set(key, True)
+    return valid
+
+
+def _validate_transaction_worker(transaction):
+    """Validate a transaction (dict) in a worker process of the pool."""
+    global _worker_bigchain
+    if _worker_bigchain is None:
+        # imported here to avoid a circular import
+        from bigchaindb import Bigchain
+        _worker_bigchain = Bigchain()
+    _worker_bigchain.validate_transaction(Transaction.from_dict(transaction))
+
 
 class Asset(Asset):
     @staticmethod
@@ -36,13 +97,13 @@ class Asset(Asset):
         if not isinstance(transactions, list):
             transactions = [transactions]
 
-        # create a set of asset_ids
-        asset_ids = {tx.asset.data_id for tx in transactions}
-
-        # check that all the transasctions have the same asset_id
-        if len(asset_ids) > 1:
-            raise AssetIdMismatch("All inputs of a transaction need to have the same asset id.")
-        return asset_ids.pop()
+        # check that all the transasctions have the same asset_id as the
+        # first one, stopping at the first mismatch
+        asset_id = transactions[0].asset.data_id
+        for tx in transactions:
+            if tx.asset.data_id != asset_id:
+                raise AssetIdMismatch("All inputs of a transaction need to have the same asset id.")
+        return asset_id
 
 
 class Transaction(Transaction):
@@ -72,12 +133,10 @@ class Transaction(Transaction):
             return self
         if len(self.fulfillments) == 0 and self.operation != Transaction.CONTRACT and self.operation != Transaction.INTERIM:
             # print(self.id)
-            print('Transaction contains no fulfillments')
             raise ValueError('Transaction contains no fulfillments')
         # print("3")
         # print("self::",self)
         if len(self.conditions) == 0 and self.operation != Transaction.CONTRACT and self.operation != Transaction.INTERIM:
-            print('Transaction contains no conditions')
             raise ValueError('Transaction contains no conditions')
 
         input_conditions = []
@@ -99,14 +158,21 @@ class Transaction(Transaction):
             # print("6")
             # check inputs
             # store the inputs so that we can check if the asset ids match
+            # the inputs are read in bulk: one query for the input
+            # transactions, and one for the transactions spending them
+            inputs = [(ffill.tx_input.txid, ffill.tx_input.cid)
+                      for ffill in self.fulfillments]
             input_txs = []
-            for ffill in self.fulfillments:
-                input_txid = ffill.tx_input.txid
-                input_cid = ffill.tx_input.cid
-                logger.debug("Start inputs get_transaction %s", self.id)
-                input_tx, status = bigchain. \
-                    get_transaction(input_txid, include_status=True)
-                logger.debug("End inputs get_transaction  %s, %s", self.id, status)
+            # `self.id` hashes the whole transaction, it is only computed
+            # for the debug messages when they are logged
+            debug = logger.isEnabledFor(logging.DEBUG)
+            if debug:
+                logger.debug("Start inputs get_transactions_bulk %s", self.id)
+            found = bigchain.get_transactions_bulk(txid for txid, _ in inputs)
+            if debug:
+                logger.debug("End inputs get_transactions_bulk %s", self.id)
+            for input_txid, input_cid in inputs:
+                input_tx, status = found[input_txid]
                 if input_tx is None:
                     raise TransactionDoesNotExist("input `{}` doesn't exist"
                                                   .format(input_txid))
@@ -115,16 +181,21 @@ class Transaction(Transaction):
                     raise FulfillmentNotInValidBlock(
                         'input `{}` does not exist in a valid block'.format(
                             input_txid))
-                logger.debug("Start inputs get_spent %s", self.id)
-                spent = bigchain.get_spent(input_txid, ffill.tx_input.cid)
-                logger.debug("End inputs get_spent  %s, %r", self.id, bool(spent))
-                if spent and spent.id != self.id:
-                    raise DoubleSpend('input `{}` was already spent'
-                                      .format(input_txid))
 
                 input_conditions.append(input_tx.conditions[input_cid])
                 input_txs.append(input_tx)
 
+            if debug:
+                logger.debug("Start inputs get_spent_bulk %s", self.id)
+            spent_inputs = bigchain.get_spent_bulk(inputs)
+            if debug:
+                logger.debug("End inputs get_spent_bulk %s", self.id)
+            for input_txid, input_cid in inputs:
+                spent = spent_inputs[(input_txid, input_cid)]
+                if spent and spent.id != self.id:
+                    raise DoubleSpend('input `{}` was already spent'
+                                      .format(input_txid))
+
             # validate asset id
             asset_id = Asset.get_asset_id(input_txs)
             if asset_id != self.asset.data_id:
@@ -139,7 +210,9 @@ class Transaction(Transaction):
             # validate contract signature
             # 1.validate the contract users signture
             # print("7")
-            ContractBody = deepcopy(self.Contract["ContractBody"])
+            # a shallow copy is enough: only the signatures are replaced and
+            # the body is not modified by `serialize`
+            ContractBody = dict(self.Contract["ContractBody"])
             contract_owners = ContractBody["ContractOwners"]
             contract_signatures = ContractBody["ContractSignatures"]
             ContractBody["ContractSignatures"] = None
@@ -147,12 +220,9 @@ class Transaction(Transaction):
             if contract_owners != None and contract_signatures != None:
                 if len(contract_owners) < len(contract_signatures):
                     raise MutilContractOwner
-                for index, contract_sign in enumerate(contract_signatures):
-                    owner_pubkey = contract_owners[index]
-                    signature = contract_sign["Signature"]
-                    if not self.is_signature_valid(detail_serialized, owner_pubkey, signature):
-                        print("Invalid contract Signature")
-                        raise InvalidSignature()
+                signatures = [contract_sign["Signature"] for contract_sign in contract_signatures]
+                if not self.are_signatures_valid(detail_serialized, contract_owners, signatures):
+                    raise InvalidSignature('Invalid contract signature')
                 return self
             else:
                 # TODO 2.validate the contract votes?
@@ -161,45 +231,73 @@ class Transaction(Transaction):
         # print("validate in=3========",self.operation,"==",self.version)
         if self.version == 2:
             # 1.validate the nodes signature
-            voters = self.Relation["Voters"]
-            votes = self.Relation["Votes"]
-            # print("taskid 146 --- ",self.Relation["TaskId"])
-            # tx_dict = deepcopy(self.to_dict())
-            # tx_dict["transaction"].pop('Relation')
-            # tx_dict["transaction"].pop('Contract')
-            # detail_serialized = serialize(tx_dict)
+            # the votes sign the transaction id, no copy of the
+            # transaction needs to be serialized
+            relation = self.Relation
+            voters = relation["Voters"]
+            votes = relation["Votes"]
 
             if len(voters) < len(votes):
                 raise MutilcontractNode
 
-            for index, vote in enumerate(votes):
-                # print(index)
-                owner_pubkey = voters[index]
-                signature = vote["Signature"]
-                detail_serialized = self.id
-                print(detail_serialized)
-                # print(owner_pubkey)
-                # print(signature)
-                if not self.is_signature_valid(detail_serialized, owner_pubkey, signature):
-                    print("Invalid vote Signature")
-                    raise InvalidSignature()
+            signatures = [vote["Signature"] for vote in votes]
+            if not self.are_signatures_valid(self.id, voters, signatures):
+                raise InvalidSignature('Invalid vote signature')
             return self
-        logger.debug("Start fulfillments_valid %s", self.id)
-        if not self.fulfillments_valid(input_conditions):
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Start fulfillments_valid %s", self.id)
+        if not self._fulfillments_valid_cached(input_conditions):
             raise InvalidSignature()
         else:
-            logger.debug("End fulfillments_valid %s", self.id)
+            if debug:
+                logger.debug("End fulfillments_valid %s", self.id)
             return self
 
+    def _fulfillments_valid_cached(self, input_conditions):
+        """Same as :meth:`fulfillments_valid`, reusing the previous
+        successful checks of the same transaction."""
+
+        # the id of a transaction does not cover its signatures
+        try:
+            key = (self.id,
+                   tuple(ffill.fulfillment.serialize_uri() for ffill in self.fulfillments),
+                   tuple(cond.fulfillment.condition_uri for cond in input_conditions))
+        except (TypeError, ValueError):
+            # e.g. unsigned fulfillments, reported by `fulfillments_valid`
+            return self.fulfillments_valid(input_conditions)
+        if _valid_fulfillments.get(key):
+            return True
+        valid = self.fulfillments_valid(input_conditions)
+        if valid:
+            _valid_fulfillments.set(key, True)
+        return valid
+
     def is_signature_valid(self, detail, verify_key, signature):
-        # only accepts bytesting messages
-        detail_serialized = detail.encode()
-        verifying_key = VerifyingKey(verify_key)
+        # only accepts bytesting messages, `detail` may already be encoded
+        detail_serialized = detail if isinstance(detail, bytes) else detail.encode()
+        verifying_key = _verifying_key(verify_key)
         try:
             return verifying_key.verify(detail_serialized, signature)
         except (ValueError, AttributeError):
             return False
 
+    def are_signatures_valid(self, detail, verify_keys, signatures):
+        """Check the signatures of ``detail`` by the matching ``verify_keys``.
+
+        The message is encoded once for all the signatures (``detail`` may
+        also be given already encoded), and the check stops at the first
+        invalid signature.
+        """
+        detail_serialized = detail if isinstance(detail, bytes) else detail.encode()
+        for verify_key, signature in zip(verify_keys, signatures):
+            try:
+                if not _verifying_key(verify_key).verify(detail_serialized, signature):
+                    return False
+            except (ValueError, AttributeError):
+                return False
+        return True
+
 
 class Block(object):
     def __init__(self, transactions=None, node_pubkey=None, timestamp=None,
@@ -222,6 +320,34 @@ class Block(object):
         self.node_pubkey = node_pubkey
         self.signature = signature
 
+    def __setattr__(self, name, value):
+        # the serialized block body is cached, it is dropped as soon as one
+        # of the attributes it is made of is replaced
+        if name in ('transactions', 'node_pubkey', 'timestamp', 'voters'):
+            self.__dict__['_body'] = None
+        super().__setattr__(name, value)
+
+    def _get_body(self):
+        """Return the serialization of the block body and the block id.
+
+        Only strings are cached: a dict could be mutated by the caller it
+        was given to or taken from.
+        """
+        if self._body is None:
+            if len(self.transactions) == 0:
+                raise OperationError('Empty block creation is not allowed')
+
+            # same output as `serialize` on the body dict (sorted keys, no
+            # spaces), but the transactions are serialized one at a time so
+            # that their dicts are not all held in memory at once
+            block_serialized = '{{"node_pubkey":{},"timestamp":{},"transactions":[{}],"voters":{}}}'.format(
+                serialize(self.node_pubkey),
+                serialize(self.timestamp),
+                ','.join(serialize(tx.to_dict()) for tx in self.transactions),
+                serialize(self.voters))
+            self._body = (block_serialized, hash_data(block_serialized))
+        return self._body
+
     def __eq__(self, other):
         try:
             other = other.to_dict()
@@ -258,10 +384,7 @@ class Block(object):
 
         # Finally: Tentative assumption that every blockchain will want to
         # validate all transactions in each block
-        for tx in self.transactions:
-            # NOTE: If a transaction is not valid, `is_valid` will throw an
-            #       an exception and block validation will be canceled.
-            bigchain.validate_transaction(tx)
+        self._validate_block_transactions(bigchain)
 
         return self
 
@@ -272,17 +395,39 @@ class Block(object):
             bigchain (:class:`~bigchaindb.Bigchain`): An instantiated Bigchain
                 object.
 
+        Raises:
+            OperationError: If a non-federation node signed the Block.
+            InvalidSignature: If a Block's signature is invalid.
+        """
+        block_serialized, block_id = self._get_body()
+        self._validate_block_signature_only(bigchain, self.node_pubkey, self.signature,
+                                            block_serialized, block_id)
+
+    @staticmethod
+    def _validate_block_signature_only(bigchain, node_pubkey, signature,
+                                       block_serialized, block_id):
+        """Same checks as :meth:`_validate_block`, on the parts of a block
+        whose transactions are not parsed yet.
+
+        Args:
+            bigchain (:class:`~bigchaindb.Bigchain`): An instantiated Bigchain
+                object.
+            node_pubkey (str): the public key of the creator of the block.
+            signature (str): the signature of the block.
+            block_serialized (str): the serialized block body.
+            block_id (str): the id of the block.
+
         Raises:
             OperationError: If a non-federation node signed the Block.
             InvalidSignature: If a Block's signature is invalid.
         """
         # Check if the block was created by a federation node
         possible_voters = (bigchain.nodes_except_me + [bigchain.me])
-        if self.node_pubkey not in possible_voters:
+        if node_pubkey not in possible_voters:
             raise OperationError('Only federation nodes can create blocks')
 
         # Check that the signature is valid
-        if not self.is_signature_valid():
+        if not _verify_block_signature(node_pubkey, signature, block_serialized, block_id):
             raise InvalidSignature('Invalid block signature')
 
     def _validate_block_transactions(self, bigchain):
@@ -303,45 +448,75 @@ class Block(object):
             InvalidHash: if the hash of the transaction is wrong
             InvalidSignature: if the signature of the transaction is wrong
         """
-        for tx in self.transactions:
-            # If a transaction is not valid, `validate_transactions` will
-            # throw an an exception and block validation will be canceled.
-            bigchain.validate_transaction(tx)
+        # daemonic processes (e.g. the pipeline workers) cannot start a pool
+        if len(self.transactions) < 2 or multiprocessing.current_process().daemon:
+            for tx in self.transactions:
+                # If a transaction is not valid, `validate_transactions` will
+                # throw an an exception and block validation will be canceled.
+                bigchain.validate_transaction(tx)
+            return
+
+        pool = get_process_pool()
+        futures = [pool.submit(_validate_transaction_worker, tx.to_dict())
+                   for tx in self.transactions]
+        done, not_done = wait(futures, return_when=FIRST_EXCEPTION)
+        # the block is invalid as soon as one transaction is invalid, the
+        # transactions not validated yet are dropped
+        for future in not_done:
+            future.cancel()
+        for future in futures:
+            if future in done and future.exception() is not None:
+                raise future.exception()
 
     def sign(self, signing_key):
-        block_body = self.to_dict()
-        block_serialized = serialize(block_body['block'])
-        signing_key = SigningKey(signing_key)
+        block_serialized, _ = self._get_body()
+        signing_key = _signing_key(signing_key)
         self.signature = signing_key.sign(block_serialized.encode()).decode()
         return self
 
     def is_signature_valid(self):
-        block = self.to_dict()['block']
-        # cc only accepts bytesting messages
-        block_serialized = serialize(block).encode()
-        verifying_key = VerifyingKey(block['node_pubkey'])
-        try:
-            # NOTE: CC throws a `ValueError` on some wrong signatures
-            #       https://github.com/bigchaindb/cryptoconditions/issues/27
-            return verifying_key.verify(block_serialized, self.signature)
-        except (ValueError, AttributeError):
-            return False
+        block_serialized, block_id = self._get_body()
+        return _verify_block_signature(self.node_pubkey, self.signature,
+                                       block_serialized, block_id)
+
+    @staticmethod
+    def _check_dict(block_body):
+        """Serialize and hash the body of a block dict.
+
+        Returns:
+            The serialized block body and the id of the block.
+
+        Raises:
+            InvalidHash: If the id of the block does not match its body.
+        """
+        block_serialized = serialize(block_body['block'])
+        block_id = hash_data(block_serialized)
+
+        if block_id != block_body['id']:
+            raise InvalidHash()
+
+        return block_serialized, block_id
 
     @classmethod
-    def from_dict(cls, block_body):
+    def from_dict(cls, block_body, checked=None):
+        """Build a Block from a dict.
+
+        Args:
+            block_body (dict): the block.
+            checked (tuple): the result of :meth:`_check_dict` if the block
+                has already been checked.
+
+        Raises:
+            InvalidHash: If the id of the block does not match its body.
+        """
         block = block_body['block']
-        block_serialized = serialize(block)
-        block_id = hash_data(block_serialized)
-        verifying_key = VerifyingKey(block['node_pubkey'])
+        block_serialized, block_id = checked or cls._check_dict(block_body)
 
         try:
             signature = block_body['signature']
         except KeyError:
             signature = None
 
-        if block_id != block_body['id']:
-            raise InvalidHash()
-
         # if signature is not None:
         #     # NOTE: CC throws a `ValueError` on some wrong signatures
         #     #       https://github.com/bigchaindb/cryptoconditions/issues/27
@@ -356,31 +531,33 @@ class Block(object):
         transactions = [Transaction.from_dict(tx) for tx
                         in block['transactions']]
 
-        return cls(transactions, block['node_pubkey'],
-                   block['timestamp'], block['voters'], signature)
+        block_obj = cls(transactions, block['node_pubkey'],
+                        block['timestamp'], block['voters'], signature)
+        # the body has just been serialized and hashed, keep it
+        if transactions:
+            block_obj._body = (block_serialized, block_id)
+        return block_obj
 
     @property
     def id(self):
-        return self.to_dict()['id']
+        return self._get_body()[1]
 
     def to_dict(self):
-        if len(self.transactions) == 0:
-            raise OperationError('Empty block creation is not allowed')
-
-        block = {
-            'timestamp': self.timestamp,
-            'transactions': [tx.to_dict() for tx in self.transactions],
-            'node_pubkey': self.node_pubkey,
-            'voters': self.voters,
-        }
-        block_serialized = serialize(block)
-        block_id = hash_data(block_serialized)
-
+        _, block_id = self._get_body()
         return {
             'id': block_id,
-            'block': block,
+            'block': {
+                'timestamp': self.timestamp,
+                'transactions': [tx.to_dict() for tx in self.transactions],
+                'node_pubkey': self.node_pubkey,
+                'voters': self.voters,
+            },
             'signature': self.signature,
         }
 
     def to_str(self):
-        return serialize(self.to_dict())
+        # same output as `serialize(self.to_dict())`, without serializing
+        # the cached block body again
+        block_serialized, block_id = self._get_body()
+        return '{{"block":{},"id":{},"signature":{}}}'.format(
+            block_serialized, serialize(block_id), serialize(self.signature))
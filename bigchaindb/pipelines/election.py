@@ -5,6 +5,7 @@ encapsulated in the ``Election`` class, while the sequence of actions
 is specified in ``create_pipeline``.
 """
 import logging
+from concurrent.futures import wait as wait_futures
 
 import rethinkdb as r
 from bigchaindb.common.exceptions import InvalidHash
@@ -78,8 +79,11 @@ class Election:
             data = {'id': invalid_block.id, 'node_publickey': invalid_block.node_pubkey,
                     'timestamp': invalid_block.timestamp}
             self.bigchain.insertRewrite(data)
-            for tx in invalid_block.transactions:
-                self.bigchain.write_transaction(tx)
+            # the transactions are written in as few batches as possible,
+            # the block is only done with once they are all written
+            futures = [self.bigchain.write_transaction(tx, wait=False)
+                       for tx in invalid_block.transactions]
+            wait_futures(futures)
             return
         # 不是当前节点建的块才返回，进入下一个node
         return invalid_block
@@ -110,8 +114,11 @@ class Election:
             data = {'id': invalid_block.id, 'node_publickey': invalid_block.node_pubkey,
                     'timestamp': invalid_block.timestamp}
             self.bigchain.insertRewrite(data)
-            for tx in invalid_block.transactions:
-                self.bigchain.write_transaction(tx)
+            # the transactions are written in as few batches as possible,
+            # the block is only done with once they are all written
+            futures = [self.bigchain.write_transaction(tx, wait=False)
+                       for tx in invalid_block.transactions]
+            wait_futures(futures)
             return invalid_block
         return
 
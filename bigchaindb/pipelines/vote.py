@@ -6,7 +6,7 @@ function.
 """
 
 import logging
-from collections import Counter
+import multiprocessing as mp
 
 from multipipes import Pipeline, Node
 from bigchaindb.monitor import Monitor
@@ -16,12 +16,30 @@ from bigchaindb.consensus import BaseConsensusRules
 from bigchaindb.models import Transaction, Block
 from bigchaindb.pipelines.utils import ChangeFeed
 from bigchaindb import Bigchain, config
+from bigchaindb.util import get_process_pool, process_pool_size
 import time
 
 monitor = Monitor()
 
 logger = logging.getLogger(__name__)
 
+def _now_ms():
+    """Milliseconds of the monotonic clock, to measure durations (the
+    clock is shared by the processes of the pipeline)."""
+    return int(time.monotonic() * 1000)
+
+
+# Bigchain instance of the worker processes validating the transactions
+_worker_bigchain = None
+
+
+def _is_valid_transaction(tx):
+    """Validate a transaction in a worker process of the pool."""
+    global _worker_bigchain
+    if _worker_bigchain is None:
+        _worker_bigchain = Bigchain()
+    return bool(_worker_bigchain.is_valid_transaction(tx))
+
 
 class Vote:
     """This class encapsulates the logic to vote on blocks.
@@ -43,56 +61,78 @@ class Vote:
         self.bigchain = Bigchain()
         self.last_voted_id = Bigchain().get_last_voted_block().id
 
-        self.counters = Counter()
-        self.validity = {}
+        # the transactions are validated in the process pool shared with
+        # `Block.validate`, created in the process running
+        # `validate_transactions`
+        self.workers = process_pool_size()
 
         self.invalid_dummy_tx = Transaction.create([self.bigchain.me],
                                                    [([self.bigchain.me], 1)])
 
     def validate_block(self, block):
         # wsp@monitor
-        begin_time = int(round(time.time() * 1000))
-        logger.debug("Start validating block %s", block['id'])
-        time1 = int(round(time.time() * 1000))
+        begin_time = _now_ms()
+        # the timings are only measured when they are logged
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Start validating block %s", block['id'])
+            time1 = _now_ms()
         if not self.bigchain.has_previous_vote(block['id'], block['block']['voters']):
             try:
-                block = Block.from_dict(block)
-                time2 = int(round(time.time() * 1000))
-                logger.debug("Block from_dict cost %s", time2 - time1)
+                checked = Block._check_dict(block)
             except exceptions.InvalidHash:
-                # XXX: if a block is invalid we should skip the `validate_tx`
+                # XXX: if a block is invalid we should skip the `validate_transactions`
                 # step, but since we are in a pipeline we cannot just jump to
                 # another function. Hackish solution: generate an invalid
                 # transaction and propagate it to the next steps of the
                 # pipeline.
                 return block['id'], [self.invalid_dummy_tx], begin_time
+            # the creator and the signature of the block are checked before
+            # its transactions are parsed
+            node_pubkey = block['block']['node_pubkey']
+            signature = block.get('signature')
             try:
                 # zy@secn
                 if monitor is not None:
                     # with monitor.timer('validate_block', rate=config['statsd']['rate']):
                     with monitor.timer('validate_block'):
-                        time3 = int(round(time.time() * 1000))
-                        block._validate_block(self.bigchain)
-                        time4 = int(round(time.time() * 1000))
-                        logger.debug("JUST validating block cost %s", time4 - time3)
+                        if debug:
+                            time3 = _now_ms()
+                        Block._validate_block_signature_only(self.bigchain, node_pubkey, signature, *checked)
+                        if debug:
+                            time4 = _now_ms()
+                            logger.debug("JUST validating block cost %s", time4 - time3)
                         # self.consensus.validate_block(self.bigchain, block)
                 else:
-                    block._validate_block(self.bigchain)
+                    Block._validate_block_signature_only(self.bigchain, node_pubkey, signature, *checked)
                     # self.consensus.validate_block(self.bigchain, block)
                     # self.consensus.validate_block(self.bigchain, block)
             except (exceptions.OperationError,
                     exceptions.InvalidSignature):
-                # XXX: if a block is invalid we should skip the `validate_tx`
+                # XXX: if a block is invalid we should skip the `validate_transactions`
                 # step, but since we are in a pipeline we cannot just jump to
                 # another function. Hackish solution: generate an invalid
                 # transaction and propagate it to the next steps of the
                 # pipeline.
-                return block.id, [self.invalid_dummy_tx], begin_time
-            logger.debug("End validating block %s, cost :%s", block.id, int(round(time.time() * 1000)) - begin_time)
+                return block['id'], [self.invalid_dummy_tx], begin_time
+            try:
+                block = Block.from_dict(block, checked=checked)
+            except exceptions.InvalidHash:
+                # a transaction of the block has a wrong id
+                return block['id'], [self.invalid_dummy_tx], begin_time
+            if debug:
+                time2 = _now_ms()
+                logger.debug("Block from_dict cost %s", time2 - time1)
+            if debug:
+                logger.debug("End validating block %s, cost :%s", block.id,
+                             _now_ms() - begin_time)
             return block.id, block.transactions, begin_time
 
-    def ungroup(self, block_id, transactions, begin_time):
-        """Given a block, ungroup the transactions in it.
+    def validate_transactions(self, block_id, transactions, begin_time):
+        """Validate all the transactions of a block.
+
+        The transactions are validated in parallel by a pool of processes,
+        in chunks to limit the number of transactions handed over.
 
         Args:
             block_id (str): the id of the block in progress.
@@ -101,60 +141,43 @@ class Vote:
             begin_time(int):
 
         Returns:
-            ``None`` if the block has been already voted, an iterator that
-            yields a transaction, block id, and the total number of
-            transactions contained in the block otherwise.
-        """
-        time1 = int(round(time.time() * 1000))
-        logger.debug("Start ungroup block %s", block_id)
-        num_tx = len(transactions)
-        for tx in transactions:
-            yield tx, block_id, num_tx, begin_time
-        logger.debug("End ungroup block %s, cost:%s", block_id, int(round(time.time() * 1000)) - time1)
-
-    def validate_tx(self, tx, block_id, num_tx, begin_time):
-        """Validate a transaction.
-
-        Args:
-            tx (Transaction): the transaction to validate
-            block_id (str): the id of block containing the transaction
-            num_tx (int): the total number of transactions to process
-            begin_time(int):
-
-        Returns:
-            Three values are returned, the validity of the transaction,
-            ``block_id``, ``num_tx``.
+            Three values are returned, the validity of the transactions
+            (``True`` if all of them are valid), ``block_id`` and
+            ``begin_time``.
         """
-        logger.debug("Start Validate tx %s in block %s", tx.id, block_id)
-        result = bool(self.bigchain.is_valid_transaction(tx))
-        logger.debug("End Validate tx %s in block %s , %r", tx.id, block_id, result)
-        return result, block_id, num_tx, begin_time
-
-    def vote(self, tx_validity, block_id, num_tx, begin_time):
-        """Collect the validity of transactions and cast a vote when ready.
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            time1 = _now_ms()
+            logger.debug("Start validating %s txs in block %s", len(transactions), block_id)
+        if mp.current_process().daemon:
+            # daemonic processes cannot start a pool
+            results = (self.bigchain.is_valid_transaction(tx) for tx in transactions)
+        else:
+            results = get_process_pool().map(_is_valid_transaction, transactions,
+                                    chunksize=max(1, len(transactions) // self.workers))
+        # stop at the first invalid transaction
+        validity = all(results)
+        if debug:
+            logger.debug("End validating txs in block %s, %r, cost:%s", block_id, validity,
+                         _now_ms() - time1)
+        return validity, block_id, begin_time
+
+    def vote(self, tx_validity, block_id, begin_time):
+        """Cast a vote on a block.
 
         Args:
-            tx_validity (bool): the validity of the transaction
-            block_id (str): the id of block containing the transaction
-            num_tx (int): the total number of transactions to process
+            tx_validity (bool): the validity of the transactions of the block
+            block_id (str): the id of the block
             begin_time(int):
 
         Returns:
-            None, or a vote if a decision has been reached.
+            The vote, and ``begin_time``.
         """
-        logger.debug("Vote get %s/%s tx in block %s", self.counters[block_id] + 1, num_tx, block_id)
-        self.counters[block_id] += 1
-        self.validity[block_id] = tx_validity and self.validity.get(block_id,
-                                                                    True)
-
-        if self.counters[block_id] == num_tx:
-            vote = self.bigchain.vote(block_id,
-                                      self.last_voted_id,
-                                      self.validity[block_id])
-            self.last_voted_id = block_id
-            del self.counters[block_id]
-            del self.validity[block_id]
-            return vote, begin_time
+        vote = self.bigchain.vote(block_id,
+                                  self.last_voted_id,
+                                  tx_validity)
+        self.last_voted_id = block_id
+        return vote, begin_time
 
     def write_vote(self, vote, begin_time):
         """Write vote to the database.
@@ -166,7 +189,7 @@ class Vote:
         validity = 'valid' if vote['vote']['is_block_valid'] else 'invalid'
         logger.info("Vote '%s' block %s , node_pubkey = %s", validity,
                     vote['vote']['voting_for_block'], vote['node_pubkey'])
-        end_time = int(round(time.time() * 1000))
+        end_time = _now_ms()
         vote_time = end_time - begin_time
         if monitor is not None:
             with monitor.timer('write_vote'):
@@ -200,8 +223,9 @@ def create_pipeline():
     vote_pipeline = Pipeline([
         Node(voter.validate_block,
              number_of_processes=config['argument_config']['vote_pipeline.validate_processes_num']),
-        Node(voter.ungroup, number_of_processes=config['argument_config']['vote_pipeline.ungroup_processes_num']),
-        Node(voter.validate_tx, fraction_of_cores=config['argument_config']['vote_pipeline.fraction_of_cores']),
+        # the transactions of each block are validated by the pool of the
+        # node, the votes are cast in a single process to chain them
+        Node(voter.validate_transactions),
         Node(voter.vote),
         Node(voter.write_vote)
     ])
@@ -1,7 +1,14 @@
+import os
+import sys
+import atexit
+import collections
 import contextlib
 import threading
 import queue
+import time
 import multiprocessing as mp
+from multiprocessing import util as mp_util
+from concurrent.futures import Future, ProcessPoolExecutor
 
 from bigchaindb.common import crypto
 from bigchaindb.common.util import serialize
@@ -29,6 +36,93 @@ class ProcessGroup(object):
             self.processes.append(proc)
 
 
+class _ContextPoolExecutor:
+    """The part of the `ProcessPoolExecutor` API used by the validation,
+    over a `multiprocessing` pool.
+
+    Before Python 3.7, `ProcessPoolExecutor` always forks its workers, while
+    a `multiprocessing` pool takes its start method from a context.
+    """
+
+    def __init__(self, max_workers, mp_context, initializer=None, initargs=()):
+        self._pool = mp_context.Pool(max_workers, initializer, initargs)
+
+    def submit(self, fn, *args, **kwargs):
+        future = Future()
+
+        def set_result(result):
+            # the task of a cancelled future still runs, its result is dropped
+            if future.set_running_or_notify_cancel():
+                future.set_result(result)
+
+        def set_exception(exc):
+            if future.set_running_or_notify_cancel():
+                future.set_exception(exc)
+
+        self._pool.apply_async(fn, args, kwargs, callback=set_result,
+                               error_callback=set_exception)
+        return future
+
+    def map(self, fn, iterable, chunksize=1):
+        return self._pool.imap(fn, iterable, chunksize)
+
+    def shutdown(self, wait=True):
+        self._pool.close()
+        if wait:
+            self._pool.join()
+
+
+def _init_pool_worker(config):
+    import bigchaindb
+    # the workers are not forked, they start from the default config
+    bigchaindb.config = config
+
+
+_process_pool = None
+_process_pool_pid = None
+_process_pool_lock = threading.Lock()
+
+
+def process_pool_size():
+    """The number of workers of the pool returned by `get_process_pool`."""
+
+    import bigchaindb
+    fraction = bigchaindb.config['argument_config']['vote_pipeline.fraction_of_cores']
+    return max(1, int(mp.cpu_count() * fraction))
+
+
+def get_process_pool():
+    """Return the process pool of the current process.
+
+    The transactions of the blocks are validated in this single pool,
+    bounded to `process_pool_size` workers. A pool does not survive a fork,
+    so it is created on first use in each process, and shut down when the
+    process exits.
+
+    The workers are started by a forkserver: by the time the pool is
+    created, the process runs threads (logging, connection pools), and a
+    worker forked while one of them holds a lock would deadlock.
+    """
+
+    import bigchaindb
+    global _process_pool, _process_pool_pid
+    with _process_pool_lock:
+        if _process_pool_pid != os.getpid():
+            kwargs = dict(max_workers=process_pool_size(),
+                          mp_context=mp.get_context('forkserver'),
+                          initializer=_init_pool_worker,
+                          initargs=(bigchaindb.config,))
+            if sys.version_info >= (3, 7):
+                _process_pool = ProcessPoolExecutor(**kwargs)
+            else:
+                _process_pool = _ContextPoolExecutor(**kwargs)
+            _process_pool_pid = os.getpid()
+            atexit.register(_process_pool.shutdown)
+            # the processes of the pipelines skip atexit
+            mp_util.Finalize(_process_pool, _process_pool.shutdown, exitpriority=5)
+        return _process_pool
+
+
 # Inspired by:
 # - http://stackoverflow.com/a/24741694/597097
 def pool(builder, size, timeout=None):
@@ -84,6 +178,71 @@ def pool(builder, size, timeout=None):
     return pooled
 
 
+class TTLCache(object):
+    """A bounded LRU cache whose entries can expire.
+
+    The cache is safe to share between threads: every access is guarded
+    by a reentrant lock.
+
+    Args:
+        maxsize (int): the maximum number of entries to keep, the least
+            recently used entry is evicted when the cache is full.
+        ttl (Optional[float]): the default number of seconds an entry is
+            kept. If ``None``, entries never expire.
+    """
+
+    def __init__(self, maxsize=4096, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = collections.OrderedDict()
+        self._lock = threading.RLock()
+
+    def get(self, key, default=None):
+        """Return the value stored for ``key`` or ``default`` if the key
+        is missing or expired."""
+
+        with self._lock:
+            try:
+                value, expire_at = self._data[key]
+            except KeyError:
+                return default
+            if expire_at is not None and expire_at <= time.monotonic():
+                del self._data[key]
+                return default
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        """Store ``value`` for ``key``.
+
+        Args:
+            ttl (Optional[float]): seconds to keep this entry, defaults to
+                the ttl of the cache.
+        """
+
+        ttl = self.ttl if ttl is None else ttl
+        expire_at = None if ttl is None else time.monotonic() + ttl
+        with self._lock:
+            self._data[key] = (value, expire_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, *keys):
+        """Remove ``keys`` from the cache, missing keys are ignored."""
+
+        with self._lock:
+            for key in keys:
+                self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self):
+        return len(self._data)
+
+
 # TODO: Rename this function, it's handling fulfillments not conditions
 def condition_details_has_owner(condition_details, owner):
     """
@@ -4,6 +4,8 @@ For more information please refer to the documentation on ReadTheDocs:
  - https://docs.bigchaindb.com/projects/server/en/latest/drivers-clients/http-client-server-api.html
 """
 
+import hashlib
+
 import flask
 from flask import Blueprint
 from flask import current_app
@@ -25,15 +27,32 @@ keys_url = ['acount','block-border-time-vote','transaction-condition','contract'
 perminssion = ['per_acconut','per_query','per_trans','per_contract']
 
 
+# the serialized home document and its ETag, for the config they were
+# built from
+_home_cache = {}
+
+
 @info_views.route('/')
 def home():
-    return flask.jsonify({
-        'software': '{}'.format(app_service_name),
-        'version': version.__version__,
-        'public_key': bigchaindb.config['keypair']['public'],
-        'keyring': bigchaindb.config['keyring'],
-        'api_endpoint': bigchaindb.config['api_endpoint']
-    })
+    config = bigchaindb.config
+    values = (config['keypair']['public'], tuple(config['keyring']), config['api_endpoint'])
+    try:
+        body, etag = _home_cache[values]
+    except KeyError:
+        body = flask.json.dumps({
+            'software': '{}'.format(app_service_name),
+            'version': version.__version__,
+            'public_key': config['keypair']['public'],
+            'keyring': config['keyring'],
+            'api_endpoint': config['api_endpoint']
+        }).encode()
+        etag = hashlib.sha1(body).hexdigest()
+        _home_cache.clear()
+        _home_cache[values] = body, etag
+
+    response = flask.Response(body, mimetype='application/json')
+    response.set_etag(etag)
+    return response.make_conditional(request)
 
 
 def per_acconut(func):
@@ -17,6 +17,7 @@ config = {
         'max_open_files': None,  # (int) – maximum number of files to keep open
         'lru_cache_size': None,  # lru_cache_size (int) – size of the LRU cache (in bytes)
         'compression': 'snappy',  # whether to use Snappy compression (enabled by default)
+        'bloom_filter_bits': 10,  # (int) – bits per key of the bloom filter, avoids disk reads for missing keys
 
     },
     'backup_path':'/data/backup_localdb/',
@@ -3,12 +3,84 @@
 
 import plyvel as l
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from itertools import islice
+from operator import itemgetter
 from extend.localdb import config
 
 import logging
 
 logger = logging.getLogger(__name__)
 
+_ENC = config['encoding']
+_TABLES = frozenset(config['database']['tables'])
+
+
+def _b(x):
+    """Encode a key or value for leveldb, bytes are passed through."""
+
+    return x if isinstance(x, (bytes, bytearray)) else str(x).encode(_ENC)
+
+
+_singleton_lock = threading.Lock()
+
+_db_options = None
+
+
+def reload_config():
+    """Pick up the changes of the localdb config made after the import.
+
+    The dirs already opened keep their options, see `close_all`.
+    """
+
+    global _ENC, _TABLES, _db_options
+    _ENC = config['encoding']
+    _TABLES = frozenset(config['database']['tables'])
+    _db_options = None
+
+
+def _open(name):
+    """Open the leveldb dir ``name`` with the options of config['database']."""
+
+    global _db_options
+    database = config['database']
+    if _db_options is None:
+        _db_options = dict(create_if_missing=True, paranoid_checks=False,
+                           write_buffer_size=database['write_buffer_size'], block_size=database['block_size'],
+                           max_open_files=database['max_open_files'], lru_cache_size=database['lru_cache_size'],
+                           max_file_size=database.get('max_file_size', 8 << 20),
+                           compression=database.get('compression', 'snappy'),
+                           bloom_filter_bits=database.get('bloom_filter_bits', 10))
+    return l.DB(database['path'] + name + '/', **_db_options)
+
+
+def _open_all(names):
+    """Open the independent leveldb dirs ``names`` concurrently.
+
+    Returns:
+        the dict of the conns by name.
+
+    Raises:
+        IOError: if a dir can`t be opened, the other ones are closed again.
+    """
+
+    with ThreadPoolExecutor(max_workers=len(names)) as executor:
+        futures = [(name, executor.submit(_open, name)) for name in names]
+    conns = dict()
+    error = None
+    for name, future in futures:
+        try:
+            conns[name] = future.result()
+        except Exception as e:
+            error = e
+    if error is not None:
+        for conn in conns.values():
+            close(conn)
+        raise error
+    return conns
+
 
 class LocalBlock(object):
     """Singleton LocalBlock encapsulates leveldb`s base ops base on plyvel.
@@ -26,42 +98,37 @@ class LocalBlock(object):
     # Only run once with process start.
 
     def __new__(cls):
-        if not hasattr(cls, 'instance'):
-            logger.info('init localdb dirs [block, block_header, block_records] start')
-            cls.instance = super(LocalBlock, cls).__new__(cls)
-            database = config['database']
-            parent_dir = database['path']
-            if not os.path.exists(parent_dir):
-                logging.error("localdb dirs is not exist!")
-                raise IOError("localdb dirs is not exist, you should create dirs {} for "
-                              "localdb and grant acess for current user!".format(parent_dir))
-            block_size = database['block_size']
-            write_buffer_size = database['write_buffer_size']
-            max_open_files = database['max_open_files']
-            lru_cache_size = database['lru_cache_size']
-            cls.instance.conn = dict()
-            try:
-                cls.instance.conn['node_info'] = l.DB(parent_dir + 'node_info/', create_if_missing=True,
-                                                      write_buffer_size=write_buffer_size, block_size=block_size,
-                                                      max_open_files=max_open_files, lru_cache_size=lru_cache_size)
-                cls.instance.conn['block'] = l.DB(parent_dir + 'block/', create_if_missing=True,
-                                                  write_buffer_size=write_buffer_size, block_size=block_size,
-                                                  max_open_files=max_open_files, lru_cache_size=lru_cache_size)
-                cls.instance.conn['block_header'] = l.DB(parent_dir + 'block_header/', create_if_missing=True,
-                                                         write_buffer_size=write_buffer_size, block_size=block_size,
-                                                         max_open_files=max_open_files, lru_cache_size=lru_cache_size)
-                cls.instance.conn['block_records'] = l.DB(parent_dir + 'block_records/', create_if_missing=True,
-                                                          write_buffer_size=write_buffer_size, block_size=block_size,
-                                                          max_open_files=max_open_files, lru_cache_size=lru_cache_size)
-            except IOError as msg:
-                error_tip = "You can`t acess the local data {}".format(parent_dir)
-                logger.error(error_tip)
-                close_all()
-                raise IOError(error_tip)
-
-            logger.info('init localdb dirs [block, block_header, block_records] end')
-
-        return cls.instance
+        instance = cls.__dict__.get('instance')
+        if instance is None:
+            # a leveldb dir can only be opened once, the first calls from
+            # several threads must not race
+            with _singleton_lock:
+                instance = cls.__dict__.get('instance')
+                if instance is None:
+                    instance = cls._open_dirs()
+        return instance
+
+    @classmethod
+    def _open_dirs(cls):
+        logger.info('init localdb dirs [block, block_header, block_records] start')
+        instance = super(LocalBlock, cls).__new__(cls)
+        database = config['database']
+        parent_dir = database['path']
+        if not os.path.exists(parent_dir):
+            logging.error("localdb dirs is not exist!")
+            raise IOError("localdb dirs is not exist, you should create dirs {} for "
+                          "localdb and grant acess for current user!".format(parent_dir))
+        try:
+            instance.conn = _open_all(('node_info', 'block', 'block_header', 'block_records'))
+        except IOError as msg:
+            error_tip = "You can`t acess the local data {}".format(parent_dir)
+            logger.error(error_tip)
+            raise IOError(error_tip)
+
+        cls.instance = instance
+        logger.info('init localdb dirs [block, block_header, block_records] end')
+
+        return instance
 
 
 class LocalVote(object):
@@ -79,35 +146,36 @@ class LocalVote(object):
     # Only run once with process start.
 
     def __new__(cls):
-        if not hasattr(cls, 'instance'):
-            logger.info('init localdb dirs [vote, vote_header] start')
-            cls.instance = super(LocalVote, cls).__new__(cls)
-            database = config['database']
-            parent_dir = database['path']
-            if not os.path.exists(parent_dir):
-                logging.error("localdb dirs is not exist!")
-                raise IOError("localdb dirs is not exist, you should create dirs {} for "
-                              "localdb and grant acess for current user!".format(parent_dir))
-            block_size = database['block_size']
-            write_buffer_size = database['write_buffer_size']
-            max_open_files = database['max_open_files']
-            lru_cache_size = database['lru_cache_size']
-            cls.instance.conn = dict()
-            try:
-                cls.instance.conn['vote'] = l.DB(parent_dir + 'vote/', create_if_missing=True,
-                                                 write_buffer_size=write_buffer_size, block_size=block_size,
-                                                 max_open_files=max_open_files, lru_cache_size=lru_cache_size)
-                cls.instance.conn['vote_header'] = l.DB(parent_dir + 'vote_header/', create_if_missing=True,
-                                                        write_buffer_size=write_buffer_size, block_size=block_size,
-                                                        max_open_files=max_open_files, lru_cache_size=lru_cache_size)
-            except IOError as msg:
-                error_tip = "You can`t acess the local data {}".format(parent_dir)
-                logger.error(error_tip)
-                close_all()
-                raise IOError(error_tip)
-            logger.info('init localdb dirs [vote, vote_header] end')
-
-        return cls.instance
+        instance = cls.__dict__.get('instance')
+        if instance is None:
+            # a leveldb dir can only be opened once, the first calls from
+            # several threads must not race
+            with _singleton_lock:
+                instance = cls.__dict__.get('instance')
+                if instance is None:
+                    instance = cls._open_dirs()
+        return instance
+
+    @classmethod
+    def _open_dirs(cls):
+        logger.info('init localdb dirs [vote, vote_header] start')
+        instance = super(LocalVote, cls).__new__(cls)
+        database = config['database']
+        parent_dir = database['path']
+        if not os.path.exists(parent_dir):
+            logging.error("localdb dirs is not exist!")
+            raise IOError("localdb dirs is not exist, you should create dirs {} for "
+                          "localdb and grant acess for current user!".format(parent_dir))
+        try:
+            instance.conn = _open_all(('vote', 'vote_header'))
+        except IOError as msg:
+            error_tip = "You can`t acess the local data {}".format(parent_dir)
+            logger.error(error_tip)
+            raise IOError(error_tip)
+        cls.instance = instance
+        logger.info('init localdb dirs [vote, vote_header] end')
+
+        return instance
 
 
 def check_conn_free(*args):
@@ -138,26 +206,59 @@ def close(conn):
     """
 
     if conn:
+        _read_cache.pop(conn, None)
         conn.close()
-        logger.info('leveldb close conn ... {}'.format(conn))
+        logger.info('leveldb close conn ... %s', conn)
 
 
 def close_all():
     """Close all databases dir."""
 
     tables = config['database']['tables']
-    logger.info('leveldb close all databases {}'.format(tables))
+    logger.info('leveldb close all databases %r', tables)
     result = []
-    for table in tables:
-        if table is not None:
-            try:
-                dir = config['database']['path']+table+'/'
-                close(dir)
-                result.append(dir)
-            except:
-                # print(table + ' is not exist')
+    with _singleton_lock:
+        for cls in (LocalBlock, LocalVote):
+            instance = cls.__dict__.get('instance')
+            if instance is None:
                 continue
-    logger.info('leveldb close all...{}'.format(result))
+            # the next call opens the dirs again
+            del cls.instance
+            for name, conn in instance.conn.items():
+                try:
+                    close(conn)
+                    result.append(name)
+                except Exception as e:
+                    logger.warning('leveldb close %s failed: %s', name, e)
+        _conns.clear()
+    logger.info('leveldb close all...%r', result)
+
+
+READ_CACHE_MAXSIZE = 4096
+
+# the values (or `_MISS`) read by `get`, by conn and encoded key
+_read_cache = {}
+# bumped by every write to a conn, a read overlapping a write is not cached
+_write_gen = {}
+_MISS = object()
+
+
+def _evict(conn, keys):
+    """Forget the cached reads of ``keys`` after a write to ``conn``."""
+
+    _write_gen[conn] = _write_gen.get(conn, 0) + 1
+    cache = _read_cache.get(conn)
+    if cache:
+        for key in keys:
+            cache.pop(key, None)
+
+
+# the conns already returned by `get_conn`, by (name, prefix_db)
+_conns = {}
+
+# the singleton opening each localdb dir
+_singletons = dict.fromkeys(("node_info", "block", "block_header", "block_records"), LocalBlock)
+_singletons.update(dict.fromkeys(("vote", "vote_header"), LocalVote))
 
 
 def get_conn(name, prefix_db=None):
@@ -169,16 +270,84 @@ def get_conn(name, prefix_db=None):
     Returns:
         the leveldb dir pointer.
     """
-    if prefix_db is None or prefix_db not in config['database']['tables']:
+    try:
+        return _conns[name, prefix_db]
+    except KeyError:
+        pass
+
+    if prefix_db is None or prefix_db not in _TABLES:
         raise BaseException("Ambigous localdb conn, it should be explicit!")
 
-    if prefix_db in ("node_info", "block", "block_header", "block_records"):
-        return LocalBlock().conn[name]
+    singleton = _singletons.get(prefix_db)
+    if singleton is None:
+        raise BaseException("Error prefix_db {}!".format(prefix_db))
+    conn = _conns[name, prefix_db] = singleton().conn[name]
+    return conn
 
-    if prefix_db in ("vote", 'vote_header'):
-        return LocalVote().conn[name]
 
-    return BaseException("Error prefix_db {}!".format(prefix_db))
+class _Batch(object):
+    """The pending write batch of `batched`."""
+
+    def __init__(self, conn, n, sync):
+        self.conn = conn
+        self.n = n
+        self.sync = sync
+        self.batch = conn.write_batch(sync=sync)
+        self.keys = []
+
+    def put(self, key, value):
+        self.batch.put(key, value)
+        self._added(key)
+
+    def delete(self, key):
+        self.batch.delete(key)
+        self._added(key)
+
+    def _added(self, key):
+        self.keys.append(key)
+        if len(self.keys) >= self.n:
+            self.write()
+
+    def write(self):
+        if self.keys:
+            self.batch.write()
+            _evict(self.conn, self.keys)
+            self.batch = self.conn.write_batch(sync=self.sync)
+            self.keys = []
+
+
+_local = threading.local()
+
+
+def _pending_batch(conn):
+    batch = getattr(_local, 'batch', None)
+    if batch is not None and batch.conn is conn:
+        return batch
+    return None
+
+
+@contextmanager
+def batched(conn, n=1000, sync=False):
+    """Group the `insert`, `update` and `delete` calls of the current thread
+    on conn into write batches of n mutations.
+
+    The writes are only visible to the reads once their batch is written,
+    at the latest when the block exits.
+
+    Args:
+        conn: the leveldb dir pointer.
+        n(int): the number of mutations per write batch.
+        sync(bool) – whether to use synchronous writes, it overrides the
+        sync argument of the grouped calls.
+    """
+
+    previous = getattr(_local, 'batch', None)
+    batch = _local.batch = _Batch(conn, n, sync)
+    try:
+        yield
+    finally:
+        _local.batch = previous
+        batch.write()
 
 
 def insert(conn, key, value, sync=False):
@@ -194,28 +363,41 @@ def insert(conn, key, value, sync=False):
 
     """
 
-    # logger.info('leveldb insert...' + str(key) + ":" +str(value))
-    conn.put(bytes(str(key), config['encoding']), bytes(str(value), config['encoding']), sync=sync)
+    key = _b(key)
+    batch = _pending_batch(conn)
+    if batch is not None:
+        batch.put(key, _b(value))
+        return
+    conn.put(key, _b(value), sync=sync)
+    _evict(conn, (key,))
 
 
-def batch_insertOrUpdate(conn, dict, transaction=False, sync=False):
-    """Batch insert or update the value with the special key in dict.
+def batch_insertOrUpdate(conn, items, transaction=True, sync=False):
+    """Batch insert or update the value with the special key in items.
 
     Args:
         conn: the leveldb dir pointer.
-        dict:
+        items(dict): the values by key.
         transaction(bool) – whether to enable transaction-like behaviour when
-        the batch is used in a with block.
-        sync(bool) – whether to use synchronous writes.
+        the batch is used in a with block. The batch is written at once
+        either way, so this costs nothing.
+        sync(bool) – whether to use synchronous writes, only worth it for
+        the last write of a block, not per row.
 
     Returns:
 
     """
 
+    # encode everything up front, sorted so the memtable inserts are in key
+    # order. Only the keys are compared: the sort is stable, so of two keys
+    # encoding to the same bytes (1 and '1') the later write still wins.
+    pairs = sorted(zip(map(_b, items.keys()), map(_b, items.values())),
+                   key=itemgetter(0))
     with conn.write_batch(transaction=transaction, sync=sync) as b:
-        for key in dict:
-            # logger.warn('key: ' + str(key) + ' --- value: ' + str(dict[key]))
-            b.put(bytes(str(key), config['encoding']), bytes(str(dict[key]), config['encoding']))
+        put = b.put
+        for key, value in pairs:
+            put(key, value)
+    _evict(conn, [key for key, _ in pairs])
 
 
 def delete(conn, key, sync=False):
@@ -230,27 +412,37 @@ def delete(conn, key, sync=False):
 
     """
 
-    # logger.info('leveldb delete...' + str(key) )
-    conn.delete(bytes(str(key), config['encoding']), sync=sync)
+    key = _b(key)
+    batch = _pending_batch(conn)
+    if batch is not None:
+        batch.delete(key)
+        return
+    conn.delete(key, sync=sync)
+    _evict(conn, (key,))
 
 
-def batch_delete(conn, dict, transaction=False, sync=False):
-    """Batch delete the value with the special key in dict.
+def batch_delete(conn, items, transaction=True, sync=False):
+    """Batch delete the value with the special key in items.
 
     Args:
         conn: the leveldb dir pointer.
-        dict:
+        items: the keys to delete (or a dict keyed by them).
         transaction(bool) – whether to enable transaction-like behaviour when
-        the batch is used in a with block.
-        sync(bool) – whether to use synchronous writes.
+        the batch is used in a with block. The batch is written at once
+        either way, so this costs nothing.
+        sync(bool) – whether to use synchronous writes, only worth it for
+        the last write of a block, not per row.
 
     Returns:
 
     """
 
+    keys = sorted(map(_b, items))
     with conn.write_batch(transaction=transaction, sync=sync) as b:
-        for key, value in dict:
-            b.delete(bytes(str(key), config['encoding']))
+        delete = b.delete
+        for key in keys:
+            delete(key)
+    _evict(conn, keys)
 
 
 def update(conn, key, value, sync=False):
@@ -266,8 +458,13 @@ def update(conn, key, value, sync=False):
 
     """
 
-    # logger.info('leveldb update...' + str(key) + ":" +str(value))
-    conn.put(bytes(str(key), config['encoding']), bytes(str(value), config['encoding']), sync=sync)
+    key = _b(key)
+    batch = _pending_batch(conn)
+    if batch is not None:
+        batch.put(key, _b(value))
+        return
+    conn.put(key, _b(value), sync=sync)
+    _evict(conn, (key,))
 
 
 def get(conn, key):
@@ -281,17 +478,49 @@ def get(conn, key):
         the string
     """
 
-    # logger.info('leveldb get...' + str(key))
     # get the value for the bytes_key,if not exists return None
     # bytes_val = conn.get_property(bytes(key, config['encoding']))
-    bytes_val = conn.get(bytes(str(key), config['encoding']))
+    key = _b(key)
+    cache = _read_cache.get(conn)
+    if cache is None:
+        cache = _read_cache.setdefault(conn, {})
+    bytes_val = cache.get(key)
+    if bytes_val is None:
+        gen = _write_gen.get(conn, 0)
+        bytes_val = conn.get(key)
+        if _write_gen.get(conn, 0) == gen:
+            if len(cache) >= READ_CACHE_MAXSIZE:
+                cache.clear()
+            cache[key] = _MISS if bytes_val is None else bytes_val
+    elif bytes_val is _MISS:
+        return None
     if bytes_val:
-        return bytes(bytes_val).decode(config['encoding'])
+        return bytes_val.decode(_ENC)
     else:
         return None
 
 
-def get_with_prefix(conn, prefix):
+def iter_with_prefix(conn, prefix, limit=None):
+    """Iterate the records with the special prefix, see `get_with_prefix`.
+
+    Args:
+        conn: the leveldb dir pointer.
+        prefix: the key start with,before '-'.
+        limit(int): the max number of records, all of them if None.
+
+    Returns:
+        the iterator of (key, value) strings, decoded one record at a time
+    """
+
+    dec = _ENC
+    records = conn.iterator(prefix=_b(prefix))
+    if limit is not None:
+        records = islice(records, limit)
+    for key, value in records:
+        yield key.decode(dec), value.decode(dec)
+
+
+def get_with_prefix(conn, prefix, limit=None):
     """Get the records with the special prefix.
 
     block-v1=v1
@@ -303,21 +532,19 @@ def get_with_prefix(conn, prefix):
     Args:
         conn: the leveldb dir pointer.
         prefix: the key start with,before '-'.
+        limit(int): the max number of records, all of them if None.
 
     Returns:
         the dict
     """
 
-    if conn:
-        # logger.warn(str(conn) + ' , ' + str(prefix))
-        result = {}
-        for key, value in conn.iterator(prefix=bytes(str(prefix), config['encoding'])):
-            key = bytes(key).decode(config['encoding'])
-            value = bytes(value).decode(config['encoding'])
-            result[key] = value
-        return result
-    else:
+    if conn is None:
         return None
+    if limit is not None:
+        return dict(iter_with_prefix(conn, prefix, limit))
+    dec = _ENC
+    return {key.decode(dec): value.decode(dec)
+            for key, value in conn.iterator(prefix=_b(prefix))}
 
 
 def get_withdefault(conn, key, default_value):
@@ -332,9 +559,9 @@ def get_withdefault(conn, key, default_value):
         the string
     """
 
-    # logger.info('leveldb get...' + str(key) + ",default_value=" + str(default_value))
     # get the value for the bytes_key,if not exists return defaule_value
-    bytes_val = conn.get(bytes(str(key), config['encoding']), bytes(str(default_value), config['encoding']))
-    # return bytes(bytes_val).decode(config['encoding'])
-    # logger.info('leveldb get...' + str(key) + ",default_value=" + bytes(bytes_val).decode(config['encoding']))
-    return bytes(bytes_val).decode(config['encoding'])
+    bytes_val = conn.get(_b(key))
+    if bytes_val is None:
+        # the default is not encoded only to be decoded again
+        return default_value if isinstance(default_value, str) else str(default_value)
+    return bytes_val.decode(_ENC)
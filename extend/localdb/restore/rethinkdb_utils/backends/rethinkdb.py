@@ -97,6 +97,19 @@ class RethinkDBBackend:
                 r.table('bigchain')
                 .insert(block, durability=durability))
 
+    def write_blocks(self, blocks, durability='soft'):
+        """Write several blocks to the bigchain table in a single insert.
+
+        Args:
+            blocks (list): the blocks to write.
+
+        Returns:
+            The database response.
+        """
+        return self.connection.run(
+                r.table('bigchain')
+                .insert(blocks, durability=durability))
+
     def has_transaction(self, transaction_id):
         """Check if a transaction exists in the bigchain table.
 
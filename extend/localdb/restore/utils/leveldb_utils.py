@@ -8,6 +8,8 @@ from extend.localdb import config
 
 logger = logging.getLogger(__file__)
 
+_ENC = config['encoding']
+
 
 class LocaldbUtils():
     """To test the localdb
@@ -55,24 +57,18 @@ class LocaldbUtils():
     def close_all(self):
         """Close all databases dir."""
 
-        tables = config['database']['tables']
-        logger.info('leveldb close all databases {}'.format(tables))
-        result = []
-        for table in tables:
-            if table is not None:
-                try:
-                    dir = config['database']['path'] + table + '/'
-                    dir.close()
-                    result.append(dir)
-                except:
-                    # print(table + ' is not exist')
-                    continue
-        logger.info('leveldb close all...{}'.format(result))
+        # the conns are opened per call by `get_conn` and closed by their
+        # callers, there is no handle to close here (calling close on the
+        # dir paths only raised errors, which were swallowed)
+        logger.info('leveldb close all databases %r', config['database']['tables'])
 
     def get_conn(self,conn_name):
         if conn_name in self.tables:
             try:
-                return l.DB(self.root + conn_name + "/")
+                # the same filter policy as the writer, so that the bloom
+                # filters of the tables are used by the point lookups
+                return l.DB(self.root + conn_name + "/",
+                            bloom_filter_bits=config['database'].get('bloom_filter_bits', 10))
 
                 #  snapshot has no attribute 'prefixed_db', so we use normal
                 # return l.DB(self.root + conn_name + "/").snapshot()
@@ -158,9 +154,9 @@ class LocaldbUtils():
         """
 
         if conn:
-            bytes_val = conn.get(bytes(str(key), config['encoding']))
+            bytes_val = conn.get(str(key).encode(_ENC))
             if bytes_val:
-                return bytes(bytes_val).decode(config['encoding'])
+                return bytes_val.decode(_ENC)
             else:
                 return None
 
@@ -176,9 +172,9 @@ class LocaldbUtils():
         """
 
         if conn:
-            bytes_val = conn.get(bytes(str(key), config['encoding']))
+            bytes_val = conn.get(str(key).encode(_ENC))
             if bytes_val:
-                return rapidjson.loads(bytes(bytes_val).decode(config['encoding']))
+                return rapidjson.loads(bytes_val.decode(_ENC))
             else:
                 return None
 
@@ -193,12 +189,10 @@ class LocaldbUtils():
         """
 
         if conn:
-            result = {}
-            for key, value in conn.iterator(prefix=bytes(str(prefix), config['encoding'])):
-                key = bytes(key).decode(config['encoding'])
-                value = rapidjson.loads(bytes(value).decode(config['encoding']))
-                result[key] = value
-            return result
+            dec = _ENC
+            loads = rapidjson.loads
+            return {key.decode(dec): loads(value.decode(dec))
+                    for key, value in conn.iterator(prefix=str(prefix).encode(dec))}
         else:
             return None
 
@@ -213,12 +207,9 @@ class LocaldbUtils():
         """
 
         if conn:
-            result = {}
-            for key, value in conn.iterator(prefix=bytes(str(prefix), config['encoding'])):
-                key = bytes(key).decode(config['encoding'])
-                value = bytes(value).decode(config['encoding'])
-                result[key] = value
-            return result
+            dec = _ENC
+            return {key.decode(dec): value.decode(dec)
+                    for key, value in conn.iterator(prefix=str(prefix).encode(dec))}
         else:
             return None
 
@@ -237,13 +228,13 @@ class LocaldbUtils():
         key = json_str_bytes[0]
         val = json_str_bytes[1]
 
-        key = bytes(key).decode('utf-8')
+        key = key.decode('utf-8')
         if json_str_bytes:
             try:
-                return key,rapidjson.loads(bytes(val).decode('utf-8'))
+                return key,rapidjson.loads(val.decode('utf-8'))
             except Exception as convet_ex:
                 is_obj = False
-                return key,bytes(val).decode('utf-8')
+                return key,val.decode('utf-8')
 
     def get_records_count(self,conn):
         """Get the localdb records count
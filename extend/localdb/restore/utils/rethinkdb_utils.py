@@ -36,6 +36,14 @@ class RethinkdbUtils():
         """
         return self.backend.write_block(block, durability=durability)
 
+    def write_blocks(self, blocks, durability='soft'):
+        """Write several blocks to bigchain in a single insert.
+
+        Args:
+            blocks (list): blocks to write to bigchain.
+        """
+        return self.backend.write_blocks(blocks, durability=durability)
+
     def write_vote(self, vote):
         """Write the vote to the database."""
         return self.backend.write_vote(vote)
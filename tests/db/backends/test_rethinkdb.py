@@ -0,0 +1,207 @@
+import threading
+from itertools import count
+
+import pytest
+import rethinkdb as r
+
+
+class FakeConnection:
+    """Record the queries and answer them with the given results."""
+
+    def __init__(self, *results):
+        self.results = list(results)
+        self.queries = []
+
+    def run(self, query, **kwargs):
+        self.queries.append(query)
+        result = self.results.pop(0)
+        if isinstance(result, Exception):
+            raise result
+        return result
+
+
+_db_names = count()
+
+
+@pytest.fixture
+def backend():
+    from bigchaindb.db.backends.rethinkdb import RethinkDBBackend
+
+    # a database of its own, so that the test gets a cache of its own
+    return RethinkDBBackend(host='localhost', port=28015,
+                            db='test_cache_{}'.format(next(_db_names)))
+
+
+def test_cached_lookup_is_only_queried_once(backend):
+    block = {'id': 'abc', 'block': {}}
+    backend.connection = FakeConnection(block)
+
+    assert backend.get_block_by_id('abc') == block
+    assert backend.get_block_by_id('abc') == block
+    assert len(backend.connection.queries) == 1
+
+
+def test_cached_lookup_of_missing_data_is_not_cached(backend):
+    block = {'id': 'abc', 'block': {}}
+    backend.connection = FakeConnection(None, block)
+
+    assert backend.get_block_by_id('abc') is None
+    assert backend.get_block_by_id('abc') == block
+    assert len(backend.connection.queries) == 2
+
+
+def test_cache_is_shared_by_the_backends_of_a_database(backend):
+    from bigchaindb.db.backends.rethinkdb import RethinkDBBackend
+
+    other = RethinkDBBackend(host='localhost', port=28015, db=backend.connection.db)
+    assert other.cache is backend.cache
+
+    block = {'id': 'abc', 'block': {}}
+    backend.connection = FakeConnection(block)
+    other.connection = FakeConnection()
+    backend.get_block_by_id('abc')
+
+    assert other.get_block_by_id('abc') == block
+    assert other.connection.queries == []
+
+
+def test_get_cache_returns_one_cache_per_database():
+    from bigchaindb.db.backends.rethinkdb import get_cache
+
+    assert get_cache('localhost', 28015, 'a') is get_cache('localhost', 28015, 'a')
+    assert get_cache('localhost', 28015, 'a') is not get_cache('localhost', 28015, 'b')
+
+
+def test_count_blocks_is_invalidated_by_write_blocks(backend, monkeypatch):
+    import bigchaindb
+
+    monkeypatch.setitem(bigchaindb.config['argument_config'], 'count_cache_ttl', 60)
+    backend.connection = FakeConnection(1, {'inserted': 1}, 2)
+
+    assert backend.count_blocks() == 1
+    assert backend.count_blocks() == 1
+    backend.write_blocks([{'id': 'abc', 'block': {}}])
+    assert backend.count_blocks() == 2
+    assert len(backend.connection.queries) == 3
+
+
+def test_count_blocks_expires(backend, monkeypatch):
+    import bigchaindb
+
+    monkeypatch.setitem(bigchaindb.config['argument_config'], 'count_cache_ttl', 0)
+    backend.connection = FakeConnection(0, 1)
+
+    # a count of zero is cached too, until it expires
+    assert backend.count_blocks() == 0
+    assert backend.count_blocks() == 1
+
+
+def test_insert_rewrite_invalidates_the_block(backend):
+    block = {'id': 'abc', 'block': {}}
+    backend.connection = FakeConnection(block, {'inserted': 1}, None)
+
+    assert backend.get_block_by_id('abc') == block
+    backend.insertRewrite({'id': 'abc'})
+    assert backend.get_block_by_id('abc') is None
+
+
+def _insert_response(*changes):
+    return {
+        'inserted': sum(1 for _, error in changes if error is None),
+        'errors': sum(1 for _, error in changes if error is not None),
+        'changes': [{'id': doc_id, 'error': error} for doc_id, error in changes],
+    }
+
+
+def test_insert_batcher_writes_a_full_batch_at_once():
+    from bigchaindb.db.backends.rethinkdb import InsertBatcher
+
+    connection = FakeConnection(_insert_response(('b', None), ('a', None)))
+    batcher = InsertBatcher(connection, 'backlog', batch_size=2, flush_interval=60)
+
+    first = batcher.insert({'id': 'a'})
+    assert not first.done()
+    second = batcher.insert({'id': 'b'})
+
+    assert len(connection.queries) == 1
+    assert first.result(timeout=0) == {'inserted': 1, 'errors': 0, 'deleted': 0,
+                                       'replaced': 0, 'skipped': 0, 'unchanged': 0}
+    assert second.result(timeout=0)['inserted'] == 1
+
+
+def test_insert_batcher_gives_each_document_its_own_result():
+    from bigchaindb.db.backends.rethinkdb import InsertBatcher
+
+    connection = FakeConnection(_insert_response(('a', None), ('b', 'Duplicate primary key')))
+    batcher = InsertBatcher(connection, 'backlog', batch_size=2, flush_interval=60)
+
+    inserted = batcher.insert({'id': 'a'})
+    duplicate = batcher.insert({'id': 'b'})
+
+    assert inserted.result(timeout=0)['errors'] == 0
+    assert duplicate.result(timeout=0)['inserted'] == 0
+    assert duplicate.result(timeout=0)['errors'] == 1
+    assert duplicate.result(timeout=0)['first_error'] == 'Duplicate primary key'
+
+
+def test_insert_batcher_matches_the_same_document_twice():
+    from bigchaindb.db.backends.rethinkdb import InsertBatcher
+
+    connection = FakeConnection(_insert_response(('a', None), ('a', 'Duplicate primary key')))
+    batcher = InsertBatcher(connection, 'backlog', batch_size=2, flush_interval=60)
+
+    first = batcher.insert({'id': 'a'})
+    second = batcher.insert({'id': 'a'})
+
+    assert first.result(timeout=0)['errors'] == 0
+    assert second.result(timeout=0)['errors'] == 1
+
+
+def test_insert_batcher_flushes_after_the_interval():
+    from bigchaindb.db.backends.rethinkdb import InsertBatcher
+
+    written = threading.Event()
+
+    class Connection(FakeConnection):
+        def run(self, query, **kwargs):
+            result = super().run(query, **kwargs)
+            written.set()
+            return result
+
+    connection = Connection(_insert_response(('a', None)))
+    batcher = InsertBatcher(connection, 'backlog', batch_size=100, flush_interval=0.01)
+
+    future = batcher.insert({'id': 'a'})
+
+    assert future.result(timeout=5)['inserted'] == 1
+    assert written.is_set()
+    assert batcher.buffer == []
+    assert batcher.timer is None
+
+
+def test_insert_batcher_flush_writes_the_buffered_documents():
+    from bigchaindb.db.backends.rethinkdb import InsertBatcher
+
+    connection = FakeConnection(_insert_response(('a', None)))
+    batcher = InsertBatcher(connection, 'backlog', batch_size=100, flush_interval=60)
+
+    future = batcher.insert({'id': 'a'})
+    batcher.flush()
+    # nothing left to write
+    batcher.flush()
+
+    assert future.result(timeout=0)['inserted'] == 1
+    assert len(connection.queries) == 1
+
+
+def test_insert_batcher_fails_every_document_of_a_failed_batch():
+    from bigchaindb.db.backends.rethinkdb import InsertBatcher
+
+    error = r.ReqlDriverError('connection lost')
+    connection = FakeConnection(error)
+    batcher = InsertBatcher(connection, 'backlog', batch_size=2, flush_interval=60)
+
+    futures = [batcher.insert({'id': 'a'}), batcher.insert({'id': 'b'})]
+
+    for future in futures:
+        assert future.exception(timeout=0) is error
@@ -0,0 +1,221 @@
+import gc
+
+import pytest
+import rethinkdb as r
+
+
+class FakeConn:
+
+    def __init__(self):
+        self.closed = False
+        self.noreply_waited = False
+
+    def close(self, noreply_wait=True):
+        self.closed = True
+        self.noreply_waited = noreply_wait
+
+
+class FakeCursorEmpty(StopIteration):
+    pass
+
+
+class FakeCursor:
+
+    def __init__(self, items):
+        self.items = list(items)
+        self.closed = False
+
+    def next(self, wait=True):
+        if not self.items:
+            raise FakeCursorEmpty()
+        return self.items.pop(0)
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def connect(monkeypatch):
+    """Replace the driver's connect, return the connections opened."""
+
+    opened = []
+
+    def fake_connect(**kwargs):
+        conn = FakeConn()
+        opened.append(conn)
+        return conn
+
+    monkeypatch.setattr(r, 'connect', fake_connect)
+    return opened
+
+
+@pytest.fixture
+def pool(connect):
+    from bigchaindb.db.utils import ConnectionPool
+
+    return ConnectionPool('localhost', 28015, 'bigchain', min_size=1, max_size=2,
+                          acquire_timeout=0.01)
+
+
+def test_pool_reuses_released_connections(pool, connect):
+    conn = pool.acquire()
+    pool.release(conn)
+
+    assert pool.acquire() is conn
+    assert len(connect) == 1
+
+
+def test_pool_bounds_the_connections_in_use(pool, connect):
+    first = pool.acquire()
+    pool.acquire()
+
+    with pytest.raises(r.ReqlDriverError):
+        pool.acquire()
+
+    pool.release(first)
+    assert pool.acquire() is first
+    assert len(connect) == 2
+
+
+def test_pool_discard_closes_the_connection_and_frees_its_slot(pool, connect):
+    first = pool.acquire()
+    pool.acquire()
+
+    pool.discard(first)
+
+    assert first.closed
+    assert pool.acquire() is not first
+    assert len(connect) == 3
+
+
+def test_pool_frees_the_slot_when_connecting_fails(pool, monkeypatch):
+    def failing_connect(**kwargs):
+        raise r.ReqlDriverError('unreachable')
+
+    monkeypatch.setattr(r, 'connect', failing_connect)
+    pool.max_tries = 1
+
+    for _ in range(3):
+        with pytest.raises(r.ReqlDriverError):
+            pool.acquire()
+    # the failed attempts did not keep their slots
+    assert pool.slots.acquire(blocking=False)
+    assert pool.slots.acquire(blocking=False)
+
+
+def test_pool_evicts_idle_connections_down_to_min_size(pool, connect):
+    conns = [pool.acquire(), pool.acquire()]
+    for conn in conns:
+        pool.release(conn)
+
+    pool.idle_timeout = 0
+    pool.evict_idle()
+
+    assert len(pool.idle) == 1
+    assert sum(conn.closed for conn in conns) == 1
+
+
+def test_pool_evicted_connections_wait_for_their_noreply_writes(pool):
+    conns = [pool.acquire(), pool.acquire()]
+    for conn in conns:
+        pool.release(conn)
+
+    pool.idle_timeout = 0
+    pool.evict_idle()
+
+    evicted, = [conn for conn in conns if conn.closed]
+    assert evicted.noreply_waited
+
+
+def test_pooled_cursor_releases_its_connection_at_the_end(pool):
+    from bigchaindb.db.utils import PooledCursor
+
+    conn = pool.acquire()
+    cursor = FakeCursor([1, 2])
+
+    assert list(PooledCursor(cursor, pool, conn)) == [1, 2]
+    assert not conn.closed
+    assert pool.idle[-1][0] is conn
+
+
+def test_pooled_cursor_dropped_before_its_end_discards_its_connection(pool):
+    from bigchaindb.db.utils import PooledCursor
+
+    conn = pool.acquire()
+    cursor = FakeCursor([1, 2])
+    pooled = PooledCursor(cursor, pool, conn)
+    assert pooled.next() == 1
+
+    del pooled
+    gc.collect()
+
+    assert cursor.closed
+    assert conn.closed
+    assert not pool.idle
+    # both slots are free again
+    pool.acquire()
+    pool.acquire()
+
+
+def test_pooled_cursor_close(pool):
+    from bigchaindb.db.utils import PooledCursor
+
+    conn = pool.acquire()
+    cursor = FakeCursor([1, 2])
+    pooled = PooledCursor(cursor, pool, conn)
+
+    pooled.close()
+    # closing again is a no-op
+    pooled.close()
+
+    assert cursor.closed
+    assert conn.closed
+    assert not pool.idle
+
+
+def test_get_pool_returns_one_pool_per_database(connect):
+    from bigchaindb.db.utils import get_pool
+
+    pool = get_pool('localhost', 28015, 'test_get_pool', 1, 2)
+
+    assert get_pool('localhost', 28015, 'test_get_pool', 1, 2) is pool
+    assert get_pool('localhost', 28015, 'test_get_pool_other', 1, 2) is not pool
+
+
+def test_pool_opens_no_connection_before_the_first_query(connect):
+    from bigchaindb.db.utils import Connection
+
+    class Query:
+        def run(self, conn, **kwargs):
+            return 'result'
+
+    connection = Connection(host='localhost', port=28015, db='test_lazy_pool',
+                            pool_min=10, pool_max=20)
+    assert not connection.pool.idle
+    assert connect == []
+
+    assert connection.run(Query()) == 'result'
+    assert connection.run(Query()) == 'result'
+    assert len(connect) == 1
+
+
+def test_rapidjson_decoder_converts_the_pseudo_types():
+    import datetime
+    from bigchaindb.db.utils import RapidJSONDecoder
+
+    decoded = RapidJSONDecoder().decode(
+        '{"t": {"$reql_type$": "TIME", "epoch_time": 0, "timezone": "+00:00"}, "n": 1}')
+
+    assert decoded['t'] == datetime.datetime(1970, 1, 1, tzinfo=datetime.timezone.utc)
+    assert decoded['n'] == 1
+
+
+def test_rapidjson_decoder_reads_numbers_too_big_for_a_double_as_inf():
+    import datetime
+    from bigchaindb.db.utils import RapidJSONDecoder
+
+    decoded = RapidJSONDecoder().decode(
+        '{"t": {"$reql_type$": "TIME", "epoch_time": 0}, "n": 1e400}')
+
+    assert decoded['n'] == float('inf')
+    assert decoded['t'] == datetime.datetime(1970, 1, 1)
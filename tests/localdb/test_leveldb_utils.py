@@ -0,0 +1,159 @@
+import pytest
+
+
+@pytest.fixture
+def conn(tmpdir):
+    import plyvel
+
+    db = plyvel.DB(str(tmpdir.join('db')), create_if_missing=True)
+    yield db
+    db.close()
+
+
+def test_batch_insert_or_update_keeps_the_later_of_two_equal_keys(conn):
+    from extend.localdb.leveldb import utils
+
+    utils.batch_insertOrUpdate(conn, {'1': 'b', 1: 'a', 'other': 1})
+
+    assert conn.get(b'1') == b'a'
+    assert conn.get(b'other') == b'1'
+
+
+def test_get_caches_the_values(conn):
+    from extend.localdb.leveldb import utils
+
+    utils.insert(conn, 'key', 'value')
+    assert utils.get(conn, 'key') == 'value'
+
+    # written behind the cache
+    conn.put(b'key', b'other')
+    assert utils.get(conn, 'key') == 'value'
+
+
+def test_get_caches_the_missing_keys(conn):
+    from extend.localdb.leveldb import utils
+
+    assert utils.get(conn, 'key') is None
+
+    conn.put(b'key', b'value')
+    assert utils.get(conn, 'key') is None
+
+
+@pytest.mark.parametrize('write', [
+    lambda utils, conn: utils.insert(conn, 'key', 'new'),
+    lambda utils, conn: utils.update(conn, 'key', 'new'),
+    lambda utils, conn: utils.batch_insertOrUpdate(conn, {'key': 'new', 'other': 1}),
+])
+def test_writes_evict_the_cached_values(conn, write):
+    from extend.localdb.leveldb import utils
+
+    utils.insert(conn, 'key', 'value')
+    assert utils.get(conn, 'key') == 'value'
+
+    write(utils, conn)
+    assert utils.get(conn, 'key') == 'new'
+
+
+@pytest.mark.parametrize('delete', [
+    lambda utils, conn: utils.delete(conn, 'key'),
+    lambda utils, conn: utils.batch_delete(conn, ['key']),
+])
+def test_deletes_evict_the_cached_values(conn, delete):
+    from extend.localdb.leveldb import utils
+
+    utils.insert(conn, 'key', 'value')
+    assert utils.get(conn, 'key') == 'value'
+
+    delete(utils, conn)
+    assert utils.get(conn, 'key') is None
+
+
+def test_read_cache_is_bounded(conn, monkeypatch):
+    from extend.localdb.leveldb import utils
+
+    monkeypatch.setattr(utils, 'READ_CACHE_MAXSIZE', 2)
+    for key in range(5):
+        utils.get(conn, key)
+
+    assert len(utils._read_cache[conn]) <= 2
+
+
+def test_close_drops_the_read_cache(tmpdir):
+    import plyvel
+    from extend.localdb.leveldb import utils
+
+    db = plyvel.DB(str(tmpdir.join('db')), create_if_missing=True)
+    utils.get(db, 'key')
+    utils.close(db)
+
+    assert db not in utils._read_cache
+
+
+def test_get_with_prefix(conn):
+    from extend.localdb.leveldb import utils
+
+    utils.batch_insertOrUpdate(conn, {'block-1': 'a', 'block-2': 'b', 'vote-1': 'c'})
+
+    assert utils.get_with_prefix(conn, 'block-') == {'block-1': 'a', 'block-2': 'b'}
+    assert utils.get_with_prefix(conn, 'block-', limit=1) == {'block-1': 'a'}
+    assert list(utils.iter_with_prefix(conn, 'vote')) == [('vote-1', 'c')]
+
+
+def test_batched_writes_every_n_mutations(conn):
+    from extend.localdb.leveldb import utils
+
+    with utils.batched(conn, n=2):
+        utils.insert(conn, 'a', 1)
+        # not written yet
+        assert conn.get(b'a') is None
+        utils.insert(conn, 'b', 2)
+        assert conn.get(b'a') == b'1'
+        utils.update(conn, 'c', 3)
+        assert conn.get(b'c') is None
+
+    assert conn.get(b'c') == b'3'
+
+
+def test_batched_evicts_the_cached_values_when_written(conn):
+    from extend.localdb.leveldb import utils
+
+    utils.insert(conn, 'a', 'value')
+    assert utils.get(conn, 'a') == 'value'
+
+    with utils.batched(conn):
+        utils.delete(conn, 'a')
+        assert utils.get(conn, 'a') == 'value'
+
+    assert utils.get(conn, 'a') is None
+
+
+def test_batched_writes_the_pending_mutations_on_error(conn):
+    from extend.localdb.leveldb import utils
+
+    with pytest.raises(ValueError):
+        with utils.batched(conn):
+            utils.insert(conn, 'a', 1)
+            raise ValueError()
+
+    assert utils.get(conn, 'a') == '1'
+
+
+def test_batched_only_groups_the_writes_to_its_conn(conn, tmpdir):
+    import plyvel
+    from extend.localdb.leveldb import utils
+
+    other = plyvel.DB(str(tmpdir.join('other')), create_if_missing=True)
+    try:
+        with utils.batched(conn):
+            utils.insert(other, 'a', 1)
+            assert other.get(b'a') == b'1'
+    finally:
+        other.close()
+
+
+def test_get_withdefault(conn):
+    from extend.localdb.leveldb import utils
+
+    assert utils.get_withdefault(conn, 'a', 0) == '0'
+    utils.insert(conn, 'a', 1)
+    assert utils.get_withdefault(conn, 'a', 0) == '1'
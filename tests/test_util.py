@@ -0,0 +1,114 @@
+import pytest
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    from bigchaindb import util
+
+    now = [1000.0]
+    monkeypatch.setattr(util.time, 'monotonic', lambda: now[0])
+    return now
+
+
+def test_ttl_cache_get_and_set():
+    from bigchaindb.util import TTLCache
+
+    cache = TTLCache(maxsize=2)
+    assert cache.get('a') is None
+    assert cache.get('a', 'default') == 'default'
+
+    cache.set('a', 1)
+    assert cache.get('a') == 1
+    assert len(cache) == 1
+
+
+def test_ttl_cache_evicts_the_least_recently_used_entry():
+    from bigchaindb.util import TTLCache
+
+    cache = TTLCache(maxsize=2)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    # reading `a` makes `b` the least recently used entry
+    cache.get('a')
+    cache.set('c', 3)
+
+    assert len(cache) == 2
+    assert cache.get('a') == 1
+    assert cache.get('b') is None
+    assert cache.get('c') == 3
+
+
+def test_ttl_cache_entries_expire(clock):
+    from bigchaindb.util import TTLCache
+
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set('a', 1)
+    cache.set('b', 2, ttl=10)
+
+    clock[0] += 4.9
+    assert cache.get('a') == 1
+
+    clock[0] += 0.1
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+    clock[0] += 5
+    assert cache.get('b') is None
+    assert len(cache) == 0
+
+
+def test_ttl_cache_entries_without_ttl_never_expire(clock):
+    from bigchaindb.util import TTLCache
+
+    cache = TTLCache(maxsize=10)
+    cache.set('a', 1)
+
+    clock[0] += 10 ** 9
+    assert cache.get('a') == 1
+
+
+def test_ttl_cache_set_replaces_the_entry_and_its_ttl(clock):
+    from bigchaindb.util import TTLCache
+
+    cache = TTLCache(maxsize=10, ttl=5)
+    cache.set('a', 1)
+    clock[0] += 4
+    cache.set('a', 2)
+    clock[0] += 4
+
+    assert cache.get('a') == 2
+
+
+def test_ttl_cache_pop_and_clear():
+    from bigchaindb.util import TTLCache
+
+    cache = TTLCache(maxsize=10)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.set('c', 3)
+
+    cache.pop('a', 'missing')
+    assert cache.get('a') is None
+    assert cache.get('b') == 2
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_context_pool_executor():
+    import operator
+    import multiprocessing as mp
+    from concurrent.futures import wait
+    from bigchaindb.util import _ContextPoolExecutor
+
+    executor = _ContextPoolExecutor(2, mp.get_context('forkserver'))
+    try:
+        assert list(executor.map(abs, [-1, -2, 3], chunksize=2)) == [1, 2, 3]
+
+        futures = [executor.submit(operator.truediv, 1, 2),
+                   executor.submit(operator.truediv, 1, 0)]
+        wait(futures, timeout=30)
+        assert futures[0].result() == 0.5
+        assert isinstance(futures[1].exception(), ZeroDivisionError)
+    finally:
+        executor.shutdown()